@@ -20,10 +20,12 @@ setup(
     packages=find_packages(),
     install_requires=[
         'simso>=0.8',
+        'numpy',
         'PyQt5>=5.11.3'
     ],
     entry_points={
-        'gui_scripts': ['simso = simsogui:run_gui']
+        'gui_scripts': ['simso = simsogui:run_gui'],
+        'console_scripts': ['simso-batch = simsogui.Batch:main']
     },
     long_description="""\
 This package provides a Graphical User Interface for SimSo. SimSo is a
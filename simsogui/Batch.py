@@ -0,0 +1,103 @@
+"""
+Simulation of configurations without a graphical interface.
+
+Each XML configuration is simulated in a pool of worker processes and
+reduced to the metrics of the parameter sweeps (see Sweep), written as CSV
+or JSON:
+
+    simso-batch -j 8 -o results.csv 'experiments/*.xml'
+
+This module does not depend on Qt, so that it starts quickly on machines
+without a display.
+"""
+import csv
+import glob
+import json
+import optparse
+import sys
+
+from .Sweep import METRICS, run_file_point, run_pool
+
+COLUMNS = ["file"] + METRICS + ["error"]
+
+
+def expand(patterns):
+    """
+    Return the files matched by the glob patterns, in order and without
+    duplicates. A pattern that matches nothing is returned as is, so that
+    its run reports the missing file.
+    """
+    filenames = []
+    for pattern in patterns:
+        for filename in sorted(glob.glob(pattern)) or [pattern]:
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+def run_file(filename):
+    """Simulate the configuration of filename and return its metrics."""
+    return run_file_point(filename, {}, None, 0)
+
+
+def run_batch(filenames, jobs=None):
+    """
+    Simulate the files on jobs processes (one per core by default) and
+    yield (index of the file, metrics) as the runs finish.
+    """
+    return run_pool(run_file, [(filename,) for filename in filenames], jobs)
+
+
+def write_results(f, rows, output_format):
+    """Write the rows, dictionaries of metrics, in f as CSV or JSON."""
+    if output_format == "json":
+        json.dump(rows, f, indent=1)
+        f.write("\n")
+    else:
+        writer = csv.DictWriter(f, COLUMNS, restval='',
+                                extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+def main(args=None):
+    parser = optparse.OptionParser(
+        usage="%prog [options] simulation.xml...",
+        description="Simulate SimSo configurations (glob patterns are "
+        "expanded) and write the metrics of each run.")
+    parser.add_option('-j', '--jobs', type='int', dest='jobs',
+                      help='number of processes (default: one per core)')
+    parser.add_option('-o', '--output', dest='output',
+                      help='output file (default: standard output)')
+    parser.add_option('-f', '--format', dest='format',
+                      choices=['csv', 'json'],
+                      help='csv or json (default: from the extension of the '
+                      'output file, else csv)')
+    (opts, args) = parser.parse_args(args)
+    if not args:
+        parser.error("expected at least one simulation file")
+
+    output_format = opts.format
+    if output_format is None:
+        output_format = ("json" if opts.output and
+                         opts.output.lower().endswith(".json") else "csv")
+
+    filenames = expand(args)
+    rows = [None] * len(filenames)
+    for done, (k, metrics) in enumerate(run_batch(filenames, opts.jobs)):
+        rows[k] = dict({"file": filenames[k]}, **metrics)
+        sys.stderr.write("[%d/%d] %s: %s\n" % (
+            done + 1, len(filenames), filenames[k],
+            metrics.get("error") or "%d misses" % metrics["misses"]))
+
+    if opts.output:
+        with open(opts.output, 'w', newline='') as f:
+            write_results(f, rows, output_format)
+    else:
+        write_results(sys.stdout, rows, output_format)
+    return 1 if any("error" in row for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
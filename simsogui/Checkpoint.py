@@ -0,0 +1,103 @@
+"""
+Checkpoints of simulations.
+
+A checkpoint is the log of what the model monitored up to its date. The
+worker appends to the file, every few simulated ms or wall-clock seconds,
+only the events monitored since the previous checkpoint (see
+serialize_increment). After an abort or a crash, the results of the run up
+to the last checkpoint are shown by replaying the log into a model (see
+replay_model).
+
+The file holds one JSON object per line, a header with the XML of the
+configuration and then the increments, so that reading a checkpoint never
+runs code from it. This module does not depend on Qt.
+"""
+import json
+import os
+import time
+import zlib
+
+from .SimulationProcess import merge_increment, serialize_increment
+
+CHECKPOINT_VERSION = 2
+
+
+def checkpoint_file(configuration, xml, directory):
+    """
+    Return the file of the checkpoints of configuration, whose XML is xml:
+    next to the simulation file, or in directory, created readable by the
+    user only, if the configuration is not saved.
+    """
+    if configuration.simulation_file:
+        return configuration.simulation_file + ".checkpoint"
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    return os.path.join(directory, "simso-%08x.checkpoint"
+                        % zlib.crc32(xml.encode()))
+
+
+class CheckpointWriter(object):
+    """
+    Progress callback of a model that appends a checkpoint to filename when
+    every_ms simulated ms or every_seconds seconds of wall clock have passed
+    since the previous one (0 disables either condition).
+    """
+    def __init__(self, filename, xml, every_ms=0, every_seconds=0):
+        self.filename = filename
+        self._xml = xml
+        self._every_ms = every_ms
+        self._every_seconds = every_seconds
+        self._model = None
+        self._positions = None
+        self._date = 0
+        self._time = None
+
+    def attach(self, model):
+        self._model = model
+        self._time = time.time()
+        with open(self.filename, 'w') as f:
+            json.dump({'version': CHECKPOINT_VERSION, 'xml': self._xml}, f)
+            f.write("\n")
+
+    def __call__(self, date):
+        model = self._model
+        if ((self._every_ms and date - self._date >=
+                self._every_ms * model.cycles_per_ms) or
+                (self._every_seconds and
+                 time.time() - self._time >= self._every_seconds)):
+            self.write()
+
+    def write(self):
+        increment, self._positions = serialize_increment(self._model,
+                                                         self._positions)
+        with open(self.filename, 'a') as f:
+            json.dump(increment, f, separators=(',', ':'))
+            f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._date = self._model.now()
+        self._time = time.time()
+
+
+def read_checkpoint(filename, xml):
+    """
+    Return the state of the model (see serialize_model) at the last complete
+    checkpoint of filename, or None if there is no checkpoint yet. Raise
+    ValueError if the checkpoint is not one of the configuration whose XML
+    is xml.
+    """
+    state = None
+    with open(filename) as f:
+        header = json.loads(f.readline())
+        if not isinstance(header, dict) or \
+                header.get('version') != CHECKPOINT_VERSION:
+            raise ValueError("Unknown checkpoint version.")
+        if header.get('xml') != xml:
+            raise ValueError("The configuration was modified since the "
+                             "checkpoint.")
+        for line in f:
+            if not line.endswith("\n"):
+                # The last checkpoint was interrupted.
+                break
+            state = merge_increment(state, json.loads(line))
+    return state
@@ -1,14 +1,223 @@
-from PyQt5.QtCore import Qt, QRect, QRectF, QLineF, QPointF
+from collections import OrderedDict
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy
+
+from PyQt5 import sip
+from PyQt5.QtCore import pyqtSignal, Qt, QAbstractListModel, QObject, QEvent, QModelIndex, QSortFilterProxyModel, QLine, QSettings, QPoint, QRect, QRectF, QLineF, QPointF, QTimer
 from PyQt5.QtGui import QPen, QFont, QImage, QPainter, QColor, QBrush
-from PyQt5.QtWidgets import QApplication, QDialog, QFileDialog, QHBoxLayout, QListWidgetItem, QListWidget, QPushButton, QScrollArea, QSizePolicy, QStyle, QToolBar, QVBoxLayout, QWidget
+from PyQt5.QtWidgets import QApplication, QCheckBox, QComboBox, QDialog, QFileDialog, QHBoxLayout, QLineEdit, QListView, QMessageBox, QProgressBar, QPushButton, QScrollArea, QSizePolicy, QStyle, QToolBar, QToolTip, QVBoxLayout, QWidget
 
 from .QxtSpanSlider import QxtSpanSliderWidget
+from .GanttIndex import (EVENT_ABORT, EVENT_MISS, EVENT_OVERHEAD, GanttIndex,
+                         JobTable, nearest)
+
+from simso.core import ProcEvent
+
+# Size (in pixels) of the tiles rendered on demand by the lazy mode and
+# maximum number of tiles kept in memory. The height of the tiles is a
+# multiple of the height of a row so that no row is split between two tiles.
+TILE_WIDTH = 512
+TILE_HEIGHT = 6 * 80
+TILE_CACHE_SIZE = 64
+
+# Maximum width of the images used when the whole chart is rasterized.
+IMAGE_WIDTH = 2 ** 15
+
+# Delay (in ms) without zooming after which the chart is rendered again at
+# the new scale. Until then, the previous rendering is stretched.
+ZOOM_DELAY = 250
+
+# The dates of the chart are in cycles. A chart is opened at DEFAULT_ZOOM
+# pixels per ms and then keeps its zoom when its dates change, but its time
+# axis is at least DEFAULT_WIDTH pixels wide when it is opened or its dates
+# change. Zooming keeps the axis between MIN_WIDTH and MAX_WIDTH (the
+# largest size of a widget) pixels wide, at most MAX_ZOOM pixels per cycle.
+DEFAULT_ZOOM = 10
+DEFAULT_WIDTH = 1000
+MIN_WIDTH = 200
+MAX_WIDTH = 2 ** 24 - 1000
+MAX_ZOOM = 50
+
+# Minimum distance (in pixels) between two labels of the time axis.
+LABEL_SPACING = 60
+
+# Colors of the deadline misses, aborts and overhead spikes of the events
+# layer, drawn at least EVENT_WIDTH pixels wide whatever the zoom.
+EVENT_COLORS = [(EVENT_MISS, QColor(255, 0, 0, 170)),
+                (EVENT_ABORT, QColor(150, 0, 150, 170)),
+                (EVENT_OVERHEAD, QColor(255, 140, 0, 170))]
+EVENT_WIDTH = 3
+
+
+def time_units(cycles_per_ms):
+    """Units of the time axis, from the largest, as (name, cycles)."""
+    cycles_per_ms = int(cycles_per_ms)
+    units = [("s", cycles_per_ms * 1000), ("ms", cycles_per_ms)]
+    if cycles_per_ms % 1000 == 0 and cycles_per_ms > 1000:
+        units.append(("\u00b5s", cycles_per_ms // 1000))
+    if units[-1][1] > 1:
+        units.append(("cycles", 1))
+    return units
+
+
+def nice_step(x):
+    """Smallest number of the series 1, 2, 5, 10, 20, 50... at least x."""
+    step = 1
+    while step < x:
+        step = step * 5 // 2 if str(step)[0] == '2' else step * 2
+    return step
+
+
+def pixel_spans(x1, x2):
+    """
+    Return the spans of whole pixels covered by the sorted abscissas
+    [x1, x2), at least one pixel wide. The spans that touch are merged so
+    that windows falling on the same pixels are drawn once.
+    """
+    if not len(x1):
+        return []
+    x1 = numpy.floor(x1)
+    x2 = numpy.maximum(numpy.ceil(x2), x1 + 1)
+    first = numpy.ones(len(x1), dtype=bool)
+    first[1:] = x1[1:] > x2[:-1]
+    x2 = numpy.maximum.reduceat(x2, numpy.flatnonzero(first))
+    return zip(x1[first].tolist(), x2.tolist())
+
+
+# Custom fields of the tasks that give their criticality level, if any.
+CRITICALITY_FIELDS = ("criticality", "crit_level", "crit")
+
+
+def criticality(task):
+    """Criticality level of task, read from its custom fields, or None."""
+    data = task.data or {}
+    for field in CRITICALITY_FIELDS:
+        if data.get(field) is not None:
+            return data[field]
+    return None
 
-from simso.core import JobEvent, ProcEvent
+
+class GanttItemsModel(QAbstractListModel):
+    """Checkable list of the processors and the tasks of a simulation."""
+    def __init__(self, sim, selected=None, parent=None):
+        QAbstractListModel.__init__(self, parent)
+        self._items = list(sim.processors) + list(sim.task_list)
+        self._processors = len(sim.processors)
+        self._checked = [selected is None or item in selected
+                         for item in self._items]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        item = self._items[index.row()]
+        if role == Qt.DisplayRole:
+            return item.name
+        elif role == Qt.CheckStateRole:
+            return Qt.Checked if self._checked[index.row()] else Qt.Unchecked
+        elif role == Qt.UserRole:
+            return item
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole:
+            return False
+        self._checked[index.row()] = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def item(self, row):
+        return self._items[row]
+
+    def is_task(self, row):
+        return row >= self._processors
+
+    def set_checked(self, rows, checked):
+        """Check or uncheck the rows at once."""
+        if not rows:
+            return
+        for row in rows:
+            self._checked[row] = checked
+        self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)),
+                              [Qt.CheckStateRole])
+
+    def checked_items(self):
+        return set(item for item, checked in zip(self._items, self._checked)
+                   if checked)
+
+
+class GanttItemsFilter(QSortFilterProxyModel):
+    """
+    Rows of a GanttItemsModel whose name contains a text or matches a
+    regular expression. The tasks can also be restricted to a criticality
+    level or to a set of tasks (those that missed a deadline).
+    """
+    def __init__(self, parent=None):
+        QSortFilterProxyModel.__init__(self, parent)
+        self._text = ""
+        self._regex = None
+        self._criticality = None
+        self._tasks = None
+
+    def set_text(self, text, regex=False):
+        """
+        Filter the names with text. An invalid regular expression does not
+        filter anything.
+        """
+        self._text = text.lower()
+        self._regex = None
+        if regex and text:
+            try:
+                self._regex = re.compile(text)
+            except re.error:
+                self._text = ""
+        self.invalidateFilter()
+
+    def set_criticality(self, level):
+        self._criticality = level
+        self.invalidateFilter()
+
+    def set_tasks(self, tasks):
+        """Show only the tasks of the set tasks, or all of them if None."""
+        self._tasks = tasks
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):
+        model = self.sourceModel()
+        item = model.item(row)
+        if self._regex is not None:
+            if not self._regex.search(item.name):
+                return False
+        elif self._text and self._text not in item.name.lower():
+            return False
+        if model.is_task(row):
+            if (self._criticality is not None and
+                    criticality(item) != self._criticality):
+                return False
+            if self._tasks is not None and item not in self._tasks:
+                return False
+        return True
+
+    def shown_rows(self):
+        """Rows of the source model that pass the filter."""
+        return [self.mapToSource(self.index(row, 0)).row()
+                for row in range(self.rowCount())]
 
 
 class GanttConfigure(QDialog):
-    def __init__(self, sim, start, end):
+    """
+    Choice of the dates (in cycles) and of the rows of the chart. selected
+    is the set of the items checked initially (all by default) and index,
+    if given, is used to offer the tasks that missed a deadline. The dates
+    are chosen to the microsecond when the cycles allow it.
+    """
+    def __init__(self, sim, start, end, selected=None, index=None):
         QDialog.__init__(self)
         #self.setCaption("Gantt configuration")
         self.layout = QVBoxLayout(self)
@@ -17,30 +226,66 @@ class GanttConfigure(QDialog):
 #            sim.observe_window[0] // sim.cycles_per_ms,
 #            min(sim.now(), sim.observe_window[1]) // sim.cycles_per_ms,
 #            self)
+        self._limit = min(sim.now(), sim.duration)
+        self._unit = sim.cycles_per_ms
+        suffix = " ms"
+        if (sim.cycles_per_ms % 1000 == 0 and
+                self._limit // (sim.cycles_per_ms // 1000) < 2 ** 31):
+            self._unit = sim.cycles_per_ms // 1000
+            suffix = " \u00b5s"
         self._slider = QxtSpanSliderWidget(
-            0,
-            min(sim.now(), sim.duration) // sim.cycles_per_ms,
-            self)
-        self._slider.setSpan(start, end)
+            0, -(-self._limit // self._unit), self)
+        self._slider.setSuffix(suffix)
+        self._slider.setSpan(start // self._unit, -(-end // self._unit))
         self.layout.addWidget(self._slider)
 
-        self._list_elements = QListWidget(self)
-        for processor in sim.processors:
-            item = QListWidgetItem(processor.name, self._list_elements)
-            item.setData(Qt.UserRole, processor)
-            self._list_elements.addItem(item)
-        for task in sim.task_list:
-            item = QListWidgetItem(task.name, self._list_elements)
-            item.setData(Qt.UserRole, task)
-            self._list_elements.addItem(item)
-        #self._list_elements.setDragDropMode(QListWidget.InternalMove)
-        for row in range(0, self._list_elements.count()):
-            self._list_elements.item(row).setCheckState(Qt.Checked)
+        filters = QWidget(self)
+        filters_layout = QHBoxLayout(filters)
+        filters_layout.setContentsMargins(0, 0, 0, 0)
+        self._filter_text = QLineEdit(filters)
+        self._filter_text.setPlaceholderText("Filter by name")
+        self._filter_regex = QCheckBox("Regex", filters)
+        filters_layout.addWidget(self._filter_text)
+        filters_layout.addWidget(self._filter_regex)
+        self._filter_text.textChanged.connect(self.update_text_filter)
+        self._filter_regex.toggled.connect(self.update_text_filter)
+
+        levels = sorted(set(criticality(task) for task in sim.task_list)
+                        - {None}, key=str)
+        self._criticality = QComboBox(filters)
+        self._criticality.addItem("All criticality levels", None)
+        for level in levels:
+            self._criticality.addItem("Criticality %s" % level, level)
+        self._criticality.setVisible(bool(levels))
+        self._criticality.currentIndexChanged.connect(
+            self.update_criticality_filter)
+        filters_layout.addWidget(self._criticality)
+
+        self._index = index
+        self._only_misses = QCheckBox("Only tasks with deadline misses",
+                                      filters)
+        self._only_misses.setEnabled(index is not None)
+        self._only_misses.toggled.connect(self.update_misses_filter)
+        filters_layout.addWidget(self._only_misses)
+        self.layout.addWidget(filters)
+
+        self._items = GanttItemsModel(sim, selected, self)
+        self._filter = GanttItemsFilter(self)
+        self._filter.setSourceModel(self._items)
+        self._list_elements = QListView(self)
+        self._list_elements.setUniformItemSizes(True)
+        self._list_elements.setModel(self._filter)
         self.layout.addWidget(self._list_elements)
 
         buttons = QWidget(self)
         buttons_layout = QHBoxLayout()
         buttons.setLayout(buttons_layout)
+        check_button = QPushButton("Check shown")
+        uncheck_button = QPushButton("Uncheck shown")
+        check_button.clicked.connect(lambda: self.check_shown(True))
+        uncheck_button.clicked.connect(lambda: self.check_shown(False))
+        buttons_layout.addWidget(check_button)
+        buttons_layout.addWidget(uncheck_button)
         buttons_layout.addStretch()
         ok_button = QPushButton("Ok")
         cancel_button = QPushButton("Cancel")
@@ -50,35 +295,79 @@ class GanttConfigure(QDialog):
         buttons_layout.addWidget(cancel_button)
         self.layout.addWidget(buttons)
 
+    def update_text_filter(self):
+        self._filter.set_text(self._filter_text.text(),
+                              self._filter_regex.isChecked())
+
+    def update_criticality_filter(self):
+        self._filter.set_criticality(self._criticality.currentData())
+
+    def update_misses_filter(self, checked):
+        self._filter.set_tasks(
+            self._index.missed_tasks() if checked else None)
+
+    def check_shown(self, checked):
+        self._items.set_checked(self._filter.shown_rows(), checked)
+
     def get_start_date(self):
-        return self._slider.lowerValue
+        return self._slider.lowerValue * self._unit
 
     def get_end_date(self):
-        return self._slider.upperValue
+        return min(self._slider.upperValue * self._unit, self._limit)
 
     def get_selected_items(self):
-        res = []
-        for row in range(0, self._list_elements.count()):
-            if self._list_elements.item(row).checkState() == Qt.Checked:
-                data = self._list_elements.item(row).data(Qt.UserRole)
-                res.append(data)
-        return res
+        return self._items.checked_items()
 
 
-class GanttCanvas(QWidget):
-    def __init__(self, sim, config, parent=None):
-        super(GanttCanvas, self).__init__(parent)
+class GanttDrawing(object):
+    """
+    Drawing of the chart, shared by the widgets that show it. It uses the
+    attributes _sim, _index, _start_date, _end_date (in cycles),
+    _selected_items, _vwidth (width of the time axis in pixels), _width,
+    _height and _loading (rows not built yet), set by init_drawing.
+    """
+    def init_drawing(self, sim, config, index=None):
         self._sim = sim
+        self._index = index or GanttIndex(sim)
         self._start_date, self._end_date, self._selected_items = config
-        self.plot()
-
-    def plot(self):
-        self._vwidth = (self._end_date - self._start_date) * 10
+        self._vwidth = self.fit_width(self.default_zoom())
         self._width = self._vwidth + 40
         self._height = 20 + 80 * len(self._selected_items)
-        if self._width < 200:
-            self._width = 200
-        self._update()
+        self._brushes = {}
+        self._label_widths = {}
+        self._loading = frozenset()
+        self._show_events = False
+        self._event_date = None
+
+    def date_range(self):
+        return self._start_date, self._end_date
+
+    def zoom_factor(self):
+        """Pixels per cycle of the time axis."""
+        return self._vwidth / float(self._end_date - self._start_date)
+
+    def default_zoom(self):
+        return max(DEFAULT_ZOOM / float(self._sim.cycles_per_ms),
+                   DEFAULT_WIDTH / float(self._end_date - self._start_date))
+
+    def fit_width(self, zoom):
+        """
+        Width of the time axis at zoom pixels per cycle, kept within the
+        limits.
+        """
+        width = min(zoom, MAX_ZOOM) * (self._end_date - self._start_date)
+        return int(round(min(MAX_WIDTH, max(MIN_WIDTH, width))))
+
+    def set_dates(self, start_date, end_date):
+        """
+        Show the dates from start_date to end_date at the same zoom, unless
+        the time axis would be narrower than DEFAULT_WIDTH.
+        """
+        zoom = self.zoom_factor()
+        self._start_date = start_date
+        self._end_date = end_date
+        self._vwidth = self.fit_width(
+            max(zoom, DEFAULT_WIDTH / float(end_date - start_date)))
 
     def convX(self, x):
         return x * self._vwidth / float(self._end_date - self._start_date)
@@ -88,14 +377,107 @@ class GanttCanvas(QWidget):
         offY = 80
         return (offX, c * offY + 15)
 
-    def paintEvent(self, event):
-        qp = QPainter(self)
-        dirtyRect = event.rect()
-        i = dirtyRect.x() // (2 ** 15)
-        rect = QRect(dirtyRect.x() % (2 ** 15), dirtyRect.y(), dirtyRect.width(), dirtyRect.height())
-        qp.drawImage(dirtyRect, self._image[i], rect)
+    def convDate(self, x):
+        return (self._start_date + (x - 20) * (self._end_date - self._start_date)
+                / float(self._vwidth))
+
+    def convDateToX(self, date):
+        return 20 + self.convX(date - self._start_date)
+
+    def job_at(self, pos):
+        """
+        Return the (JobTable, index of the job) of the job drawn at pos, by
+        an arrow, a dot or a bar, or None. Every lookup is a binary search
+        in the sorted arrays of the row.
+        """
+        rows = self.rows()
+        c = (pos.y() - 15) // 80
+        if not 0 <= c < len(rows) or (pos.y() - 15) % 80 > 52:
+            return None
+        item = rows[c]
+        if item in self._loading:
+            return None
+        date = self.convDate(pos.x())
+        # Three pixels around the arrows and the dots.
+        tolerance = 3 / self.zoom_factor()
+
+        if item in self._sim.processors:
+            row = self._index.processor(item)
+            i = int(numpy.searchsorted(row.start, date, 'right')) - 1
+            if i < 0 or row.end[i] <= date or row.kind[i] != ProcEvent.RUN:
+                return None
+            task = self._index.task_by_identifier(int(row.task[i]))
+            if task is None or not self._index.built(task):
+                return None
+            table = self._index.task(task)
+            k = table.job_at(date, item.identifier)
+        else:
+            table = self._index.task(item)
+            # The deadlines are sorted as the activations.
+            k = nearest(table.activation, date, tolerance)
+            if k < 0:
+                k = nearest(table.deadline, date, tolerance)
+            if k < 0:
+                i = nearest(table.ends, date, tolerance)
+                if i >= 0:
+                    k = int(table.ends_job[i])
+            if k < 0:
+                k = table.job_at(date)
+        if k < 0:
+            return None
+        return table, k
+
+    def job_info(self, table, k):
+        # Enough digits to show the dates to the cycle.
+        cycles_per_ms = float(self._sim.cycles_per_ms)
+        lines = [table.jobs[k].name,
+                 "Activation: %.9g ms" % (table.activation[k] / cycles_per_ms)]
+        deadline = "Deadline: %.9g ms" % (table.deadline[k] / cycles_per_ms)
+        if table.aborted[k]:
+            deadline += " (aborted)"
+        elif table.missed[k]:
+            deadline += " (missed)"
+        lines.append(deadline)
+        if table.end[k] >= 0:
+            lines.append("Response time: %.9g ms" %
+                         (table.response_time[k] / cycles_per_ms))
+        else:
+            lines.append("Response time: -")
+        lines.append("Preemptions: %d" % table.preemptions[k])
+        lines.append("Migrations: %d" % table.migrations[k])
+        return "\n".join(lines)
+
+    def render_image(self, rect):
+        """
+        Render the part of the chart covered by rect (in widget coordinates)
+        into a new QImage.
+        """
+        image = QImage(rect.width(), rect.height(), QImage.Format_ARGB32)
+        image.fill(QColor(235, 235, 235, 255))
+        qp = QPainter(image)
+        try:
+            qp.translate(-rect.x(), -rect.y())
+            self.paint_chart(qp, rect)
+        finally:
+            qp.end()
+        return image
 
-    def plot_graph(self, qp, name, start_date, end_date, step, substep, c):
+    def paint_chart(self, qp, rect):
+        """
+        Draw the part of the chart covered by rect (in widget coordinates)
+        with its background.
+        """
+        qp.save()
+        qp.setClipRect(rect)
+        qp.fillRect(rect, QColor(235, 235, 235))
+        self.plot_gantt(qp, self._sim, self._start_date, self._end_date, rect)
+        qp.restore()
+
+    def chart_size(self):
+        return self._width, self._height
+
+    def plot_graph(self, qp, name, start_date, end_date, step, substep,
+                   unit, c, first=None, last=None):
         qp.save()
         convX = self.convX
         graph_height = 50
@@ -105,257 +487,853 @@ class GanttCanvas(QWidget):
                            graph_height))
 
         qp.setFont(QFont('Decorative', 8))
-        for i in range(start_date, end_date + 1, 1):
-            h = 0
+        fh = qp.fontMetrics().height()
+        if first is None:
+            first = start_date
+        if last is None:
+            last = end_date
+        decimals = 0 if step % unit[1] == 0 else 1
+        # Only the multiples of substep can have a tick.
+        grid = []
+        ticks = []
+        for i in range(-(-first // substep) * substep, last + 1, substep):
+            pos = int(x + convX(i - start_date))
             if i % step == 0:
-                text = str(i)
-                fw = qp.fontMetrics().width(text)
-                fh = qp.fontMetrics().height()
-                qp.drawText(int(x + convX(i - start_date) - fw // 2),
+                text = "%.*f %s" % (decimals, i / float(unit[1]), unit[0])
+                qp.drawText(pos - self.label_width(qp, text) // 2,
                             graph_height + y + fh + 1, text)
-                pen = qp.pen()
                 if i != start_date and i != end_date:
-                    qp.setPen(QPen(Qt.DotLine))
-                    qp.drawLine(int(x + convX(i - start_date)), y,
-                                int(x + convX(i - start_date)),
-                                graph_height + y + 1)
-                    qp.setPen(pen)
-
+                    grid.append(QLine(pos, y, pos, graph_height + y + 1))
                 h = 4
-            elif i % substep == 0:
+            else:
                 h = 2
-            if h:
-                qp.drawLine(
-                    int(x + convX(i - start_date)), graph_height + 1 + y,
-                    int(x + convX(i - start_date)), graph_height + y + 1 + h)
+            ticks.append(QLine(pos, graph_height + 1 + y,
+                               pos, graph_height + y + 1 + h))
+        pen = qp.pen()
+        qp.setPen(QPen(Qt.DotLine))
+        qp.drawLines(grid)
+        qp.setPen(pen)
+        qp.drawLines(ticks)
+        qp.restore()
 
+        self.plot_name(qp, name, c)
+
+    def plot_name(self, qp, name, c):
+        qp.save()
+        x, y = self.origGraph(c)
         qp.translate(x - 20, y + 65)
         qp.rotate(-90)
         qp.setFont(QFont('Decorative', 10))
         qp.drawText(QRect(0, 0, 80, 20), Qt.AlignCenter, name)
         qp.restore()
 
-    def plot_rect_graph(self, qp, start_x, end_x, color_style, c):
+    def label_width(self, qp, text):
+        """
+        Width of a label of the axis with the current font of qp. The widths
+        are cached per resolution of the paint device.
+        """
+        key = (qp.device().logicalDpiX(), text)
+        width = self._label_widths.get(key)
+        if width is None:
+            width = qp.fontMetrics().width(text)
+            self._label_widths[key] = width
+        return width
+
+    def tick_steps(self, zoom):
+        """
+        Return the interval (in cycles) between two labels of the axis and
+        between two ticks, and the unit (name, cycles) of the labels, for a
+        zoom expressed in pixels per cycle. The labels are at least
+        LABEL_SPACING pixels apart and use the largest unit in which they
+        are written exactly with at most one decimal.
+        """
+        spacing = LABEL_SPACING / zoom
+        units = time_units(self._sim.cycles_per_ms)
+        cycles = next((u for _, u in units if u <= spacing), 1)
+        step = cycles * nice_step(spacing / cycles)
+        unit = next(u for u in units if step * 10 % u[1] == 0)
+        return step, max(1, step // 5), unit
+
+    def rows(self):
+        """Selected processors and tasks, in the order of the rows."""
+        return ([x for x in self._sim.processors
+                 if x in self._selected_items] +
+                [x for x in self._sim.task_list
+                 if x in self._selected_items])
+
+    def rect_graph(self, start_x, end_x, c, height=40):
+        """
+        Return the rectangle representing [start_x, end_x] in the row c, or
+        None if it is empty.
+        """
         if start_x < self._start_date:
             start_x = self._start_date
         if start_x >= end_x:
-            return
+            return None
 
         start_x -= self._start_date
         end_x -= self._start_date
 
+        x, y = self.origGraph(c)
+        return QRectF(x + self.convX(start_x), y + 50 - height,
+                      self.convX(end_x - start_x), height)
+
+    def plot_rects(self, qp, rects):
+        """
+        Draw the rectangles grouped by brush: rects maps the identifier of a
+        task (-1 for the overheads) to a list of QRectF.
+        """
         qp.save()
         qp.setPen(Qt.NoPen)
-        x, y = self.origGraph(c)
-        color, style = color_style
-        color.setAlpha(200)
-        qp.setBrush(QBrush(color, style))
-        qp.drawRect(QRectF(x + self.convX(start_x), y + 10,
-                           self.convX(end_x - start_x), 40))
+        for i, batch in rects.items():
+            qp.setBrush(self.get_brush(i))
+            qp.drawRects(batch)
         qp.restore()
-        #qp.drawLine(x + self.convX(start_x), y + 10,
-        #            x + self.convX(end_x), y + 10)
 
-    def plot_vert_line_graph(self, qp, x_line, color, c, arrow_up=False,
-                             arrow_down=False):
-        if x_line < self._start_date or x_line > self._end_date:
+    def lod_graph(self, rects, level, view_start, view_end, c):
+        """
+        Add the bars of a level of detail of a row to rects: each bin is a
+        bar of the color of its dominant task whose height is proportional
+        to the occupancy of the bin. Consecutive identical bars are merged.
+        """
+        width, occupancy, dominant, offset = level
+        first = max(int(view_start // width), offset)
+        last = int(view_end // width) + 1
+        heights = numpy.ceil(occupancy[first - offset:last - offset] * 40.0
+                             / width)
+        if not len(heights):
             return
+        dominant = dominant[first - offset:last - offset]
+        change = numpy.flatnonzero((heights[1:] != heights[:-1])
+                                   | (dominant[1:] != dominant[:-1])) + 1
+        for i, j in zip([0] + change.tolist(),
+                        change.tolist() + [len(heights)]):
+            if not heights[i]:
+                continue
+            rect = self.rect_graph(
+                (first + i) * width,
+                min((first + j) * width, self._end_date),
+                c, float(heights[i]))
+            if rect:
+                rects.setdefault(max(-1, int(dominant[i])), []).append(rect)
+
+    def vert_line_graph(self, x_line, c, arrow_up=False, arrow_down=False):
+        """
+        Return the lines of a vertical arrow at the date x_line in the row c.
+        """
+        if x_line < self._start_date or x_line > self._end_date:
+            return []
 
         x_line -= self._start_date
 
-        qp.save()
-        qp.setPen(color)
-        qp.setBrush(color)
-        qp.setRenderHint(QPainter.Antialiasing)
         arrowSize = 2.0
         x, y = self.origGraph(c)
         line = QLineF(x + self.convX(x_line), y + 10, x + self.convX(x_line),
                       y + 50)
-        qp.drawLine(line)
+        lines = [line]
         if arrow_up:
             arrowP1 = line.p1() + QPointF(arrowSize, arrowSize * 3)
             arrowP2 = line.p1() + QPointF(-arrowSize, arrowSize * 3)
-            qp.drawLine(line.p1(), arrowP1)
-            qp.drawLine(line.p1(), arrowP2)
+            lines.append(QLineF(line.p1(), arrowP1))
+            lines.append(QLineF(line.p1(), arrowP2))
         if arrow_down:
             arrowP1 = line.p2() + QPointF(arrowSize, - arrowSize * 3)
             arrowP2 = line.p2() + QPointF(-arrowSize, - arrowSize * 3)
-            qp.drawLine(line.p2(), arrowP1)
-            qp.drawLine(line.p2(), arrowP2)
+            lines.append(QLineF(line.p2(), arrowP1))
+            lines.append(QLineF(line.p2(), arrowP2))
+        return lines
+
+    def distinct_pixels(self, dates):
+        """
+        Keep only one of the dates that fall on the same pixel column.
+        """
+        if len(dates) < 2:
+            return dates
+        columns = numpy.floor(self.convX(dates - self._start_date))
+        return dates[numpy.unique(columns, return_index=True)[1]]
+
+    def plot_lines(self, qp, lines, color):
+        if not lines:
+            return
+        qp.save()
+        qp.setPen(color)
+        qp.setRenderHint(QPainter.Antialiasing)
+        qp.drawLines(lines)
         qp.restore()
 
-    def plot_circle_graph(self, qp, x_circle, color, c):
+    def circle_graph(self, x_circle, c):
         if x_circle < self._start_date:
-            return
+            return None
         x_circle -= self._start_date
+        x, y = self.origGraph(c)
+        return QRect(int(x + self.convX(x_circle) - 1), y + 50 - 1, 3, 3)
+
+    def plot_circles(self, qp, circles, color):
+        if not circles:
+            return
         qp.save()
         qp.setRenderHint(QPainter.Antialiasing)
         qp.setPen(color)
         qp.setBrush(color)
-        x, y = self.origGraph(c)
-        qp.drawEllipse(int(x + self.convX(x_circle) - 1), y + 50 - 1, 3, 3)
+        for circle in circles:
+            qp.drawEllipse(circle)
         qp.restore()
 
+    def plot_events(self, qp, item, c, view_start, view_end):
+        """
+        Draw the deadline misses, aborts and overhead spikes of the
+        processor or task item over the row c, once they are built.
+        """
+        if not self._index.events_ready():
+            return
+        events = self._index.events()
+        k = events.search(item, view_start, view_end)
+        if not len(k):
+            return
+        x, y = self.origGraph(c)
+        for kind, color in EVENT_COLORS:
+            shown = k[events.kind[k] == kind]
+            x1 = self.convDateToX(
+                numpy.maximum(events.date[shown], self._start_date))
+            x2 = self.convDateToX(
+                numpy.minimum(events.end[shown], self._end_date))
+            # Centered on the dates that are narrower than EVENT_WIDTH.
+            margin = numpy.maximum(0, EVENT_WIDTH - (x2 - x1)) / 2
+            for left, right in pixel_spans(x1 - margin, x2 + margin):
+                qp.fillRect(QRectF(left, y, right - left, 50), color)
+
+    def next_event(self, start, end, direction):
+        """
+        Return the date and the row of the chart of the next (direction > 0)
+        or previous event (miss, abort or overhead spike) of the rows, or
+        None. The search starts from the event returned last if it is still
+        between the visible dates start and end, from their middle
+        otherwise, and skips the events less than a pixel away.
+        """
+        if not self._index.events_ready():
+            return None
+        date = self._event_date
+        if date is None or not start <= date <= end:
+            date = (start + end) / 2.0
+        events = self._index.events()
+        rows = self.rows()
+        k = events.next_event(date + direction / self.zoom_factor(),
+                              direction, rows)
+        if k < 0:
+            return None
+        self._event_date = int(events.date[k])
+        return self._event_date, rows.index(events.items[events.row[k]])
+
     def get_color(self, i):
         colors = [(150, 50, 0), (20, 180, 20), (50, 200, 250), (240, 230, 0),
                   (190, 0, 250), (50, 50, 200), (238, 135, 178),
                   (40, 100, 100), (250, 180, 0), (0, 150, 100)]
         pattern = Qt.SolidPattern
-        if i > len(colors):
-            pattern = Qt.Dense2Pattern
-        elif i > 2 * len(colors):
+        if i > 2 * len(colors):
             pattern = Qt.BDiagPattern
+        elif i > len(colors):
+            pattern = Qt.Dense2Pattern
         return (QColor(*colors[i % len(colors)]), pattern)
 
-    def plot_gantt(self, event, qp, sim, start_date, end_date):
+    def get_brush(self, i):
+        """
+        Brush used for the task whose identifier is i, or for the overheads
+        if i is -1. The brushes are created once and cached.
+        """
+        brush = self._brushes.get(i)
+        if brush is None:
+            if i == -1:
+                color, style = QColor(150, 150, 150), Qt.SolidPattern
+            else:
+                color, style = self.get_color(i)
+            color.setAlpha(200)
+            brush = QBrush(color, style)
+            self._brushes[i] = brush
+        return brush
+
+    def bar_range(self, item, view_start, view_end, window=True):
+        """
+        Return the row of the processor or task item in the index, the range
+        (i, j) of its intervals visible between view_start and view_end and
+        the level of detail to draw instead of them, if any. Unless window
+        is False, a level is computed for the visible dates when the levels
+        of the row are too coarse.
+        """
+        row = self._index.build(item)
+        i, j = row.search(view_start, view_end)
+        level = None
+        # Less than one pixel per interval: use the level of detail.
+        if j - i > self.convX(view_end - view_start):
+            if window:
+                level = row.lod(1 / self.zoom_factor(), view_start, view_end)
+            else:
+                level = row.lod(1 / self.zoom_factor())
+        return row, i, j, level
+
+    def plot_bars(self, qp, item, c, view_start, view_end):
+        """
+        Draw the execution intervals of the processor or task item in the
+        row c.
+        """
+        row, i, j, level = self.bar_range(item, view_start, view_end)
+        rects = {}
+        if level:
+            self.lod_graph(rects, level, view_start, view_end, c)
+        elif isinstance(row, JobTable):
+            batch = rects.setdefault(item.identifier, [])
+            for x1, x2 in zip(row.seg_start[i:j].tolist(),
+                              row.seg_stop[i:j].tolist()):
+                rect = self.rect_graph(x1, min(x2, self._end_date), c)
+                if rect:
+                    batch.append(rect)
+        else:
+            tasks = numpy.where(row.kind[i:j] == ProcEvent.RUN,
+                                row.task[i:j], -1)
+            for x1, x2, task in zip(row.start[i:j].tolist(),
+                                    row.end[i:j].tolist(), tasks.tolist()):
+                rect = self.rect_graph(x1, min(x2, self._end_date), c)
+                if rect:
+                    rects.setdefault(task, []).append(rect)
+        self.plot_rects(qp, rects)
+
+    def plot_gantt(self, qp, sim, start_date, end_date, rect=None,
+                   rows=None):
+        """
+        Plot the chart. If rect is given, only the rows and the dates that
+        intersect it are drawn. rows is the range (first, last) of the rows
+        to draw, by default the ones that intersect rect.
+        """
         c = -1
-
-        zoom = self._vwidth / float(end_date - start_date)
-
-        if zoom < 0.3:
-            step = 200
-        elif zoom < 0.5:
-            step = 100
-        elif zoom < 2:
-            step = 50
-        elif zoom < 3:
-            step = 20
-        elif zoom < 4.5:
-            step = 10
+        if rect is None:
+            rect = QRect(0, 0, self._width, self._height)
+        if rows:
+            first_row, last_row = rows
         else:
-            step = 5
+            first_row = rect.top() // 80 - 1
+            last_row = rect.bottom() // 80 + 1
+        # Margin for the labels of the axis that overflow on the sides.
+        view_start = max(start_date, int(self.convDate(rect.left() - 40)))
+        view_end = min(end_date, int(self.convDate(rect.right() + 40)) + 1)
 
-        substep = step // 5
+        step, substep, unit = self.tick_steps(self.zoom_factor())
 
         # Plot processors
         for processor in [x for x in sim.processors
                           if x in self._selected_items]:
             c += 1
+            if c < first_row or c > last_row:
+                continue
             self.plot_graph(qp, processor.name, start_date, end_date, step,
-                            substep, c)
-
-            x1 = start_date
-            color = None
-            for evt in processor.monitor:
-                current_date = float(evt[0]) / sim.cycles_per_ms
-                if current_date > end_date:
-                    break
-
-                if evt[1].event == ProcEvent.RUN:
-                    ncolor = self.get_color(evt[1].args.task.identifier)
-                elif evt[1].event == ProcEvent.OVERHEAD:
-                    ncolor = (QColor(150, 150, 150), Qt.SolidPattern)
-                elif evt[1].event == ProcEvent.IDLE:
-                    ncolor = None
-
-                if ncolor != color:
-                    if current_date > x1 and color:
-                        self.plot_rect_graph(qp, x1, current_date, color, c)
-                    color = ncolor
-                    x1 = current_date
-
-            if color:
-                self.plot_rect_graph(qp, x1, end_date, color, c)
+                            substep, unit, c, view_start, view_end)
+            if processor in self._loading:
+                continue
+            self.plot_bars(qp, processor, c, view_start, view_end)
+            if self._show_events:
+                self.plot_events(qp, processor, c, view_start, view_end)
 
         # Plot tasks
         for task in [x for x in sim.task_list if x in self._selected_items]:
             c += 1
-            self.plot_graph(
-                qp, task.name, start_date, end_date, step, substep, c)
-
-            x1 = start_date
-            color = None
-            for evt in task.monitor:
-                current_date = evt[0] / float(sim.cycles_per_ms)
-                if current_date > end_date:
-                    break
-
-                if evt[1].event != JobEvent.ACTIVATE:
-                    if color and x1 < current_date:
-                        self.plot_rect_graph(qp, x1, current_date, color, c)
-
-                    if evt[1].event == JobEvent.EXECUTE:
-                        color = self.get_color(task.identifier)
-                    elif evt[1].event == JobEvent.PREEMPTED:
-                        color = None
-                    elif evt[1].event == JobEvent.TERMINATED:
-                        color = None
-                    elif evt[1].event == JobEvent.ABORTED:
-                        color = None
-
-                    x1 = current_date
-
-            if x1 < end_date and color:
-                self.plot_rect_graph(qp, x1, end_date, color, c)
+            if c < first_row or c > last_row:
+                continue
+            self.plot_graph(qp, task.name, start_date, end_date, step,
+                            substep, unit, c, view_start, view_end)
+            if task in self._loading:
+                continue
+            self.plot_bars(qp, task, c, view_start, view_end)
+
+            table = self._index.task(task)
+            # Jobs whose activation or deadline is visible.
+            i, j = table.search_jobs(
+                view_start - task.deadline * sim.cycles_per_ms, view_end)
+            activations = table.activation[i:j]
+            deadlines = table.deadline[i:j]
+            missed = table.missed[i:j]
+            shown = (deadlines >= view_start) & (deadlines <= end_date)
 
             # Draw activation lines.
-            for evt in task.monitor:
-                current_date = evt[0] / float(sim.cycles_per_ms)
-                if current_date > end_date:
-                    break
-
-                if evt[1].event == JobEvent.ACTIVATE:
-                    self.plot_vert_line_graph(qp, current_date,
-                                              QColor(50, 50, 50),
-                                              c, arrow_up=True)
-
-            # Draw deadlines and dots.
-            for evt in task.monitor:
-                current_date = evt[0] / float(sim.cycles_per_ms)
-                if current_date > end_date:
-                    break
-
-                if evt[1].event == JobEvent.ACTIVATE:
-                    if current_date + task.deadline <= end_date:
-                        job_end = evt[1].job.end_date or end_date
-                        if (job_end > evt[1].job.absolute_deadline
-                                * sim.cycles_per_ms or evt[1].job.aborted):
-                            color = QColor(255, 0, 0)
-                        else:
-                            color = QColor(50, 50, 50)
-                        self.plot_vert_line_graph(
-                            qp, current_date + task.deadline, color, c,
-                            arrow_down=True)
-                elif evt[1].event == JobEvent.TERMINATED:
-                    self.plot_circle_graph(
-                        qp, current_date, QColor(0, 0, 0), c)
-                elif evt[1].event == JobEvent.ABORTED:
-                    self.plot_circle_graph(
-                        qp, current_date, QColor(255, 0, 0), c)
+            lines = []
+            for date in self.distinct_pixels(
+                    activations[activations >= view_start]).tolist():
+                lines += self.vert_line_graph(date, c, arrow_up=True)
+            self.plot_lines(qp, lines, QColor(50, 50, 50))
+
+            # Draw deadlines.
+            for miss, color in ((False, QColor(50, 50, 50)),
+                                (True, QColor(255, 0, 0))):
+                lines = []
+                for date in self.distinct_pixels(
+                        deadlines[shown & (missed == miss)]).tolist():
+                    lines += self.vert_line_graph(date, c, arrow_down=True)
+                self.plot_lines(qp, lines, color)
+
+            # Draw terminations and aborts.
+            i, j = table.search_ends(view_start, view_end)
+            ends = table.ends[i:j]
+            aborted = table.ends_aborted[i:j]
+            for abort, color in ((False, QColor(0, 0, 0)),
+                                 (True, QColor(255, 0, 0))):
+                circles = [self.circle_graph(date, c) for date in
+                           self.distinct_pixels(ends[aborted == abort]).tolist()]
+                self.plot_circles(qp, [x for x in circles if x], color)
+
+            if self._show_events:
+                self.plot_events(qp, task, c, view_start, view_end)
+
+
+class WorkerSignals(QObject):
+    """
+    Signals of a widget emitted by its worker threads. The relay is not a
+    child of the widget and forwards the signals named names to it: if the
+    widget is deleted while a worker is still running, the connections are
+    gone and the worker does not emit on a deleted object.
+    """
+    rowBuilt = pyqtSignal(int, object)
+    tileRendered = pyqtSignal(int, int, int, QImage)
+    eventsReady = pyqtSignal()
+    overviewReady = pyqtSignal(object)
+
+    def __init__(self, widget, *names):
+        QObject.__init__(self)
+        for name in names:
+            getattr(self, name).connect(getattr(widget, name))
+
+
+class GanttActions(object):
+    """
+    Actions of the toolbar shared by the widgets that show the chart. They
+    use drawing(), which returns the GanttDrawing at the zoom of the
+    widget, visible_dates(), set_config(start_date, end_date,
+    selected_items), scroll_to_date(date) and scroll_to_row(c). The widget
+    emits eventsReady once the events of the chart are built.
+    """
+    def events_ready(self):
+        return self.drawing()._index.events_ready()
+
+    def build_events(self):
+        """
+        Build the events of the chart in a worker thread if they are not
+        already built, for the widgets that have no builder of their own.
+        """
+        self._builder = None
+        index = self.drawing()._index
+        if index.events_ready():
+            return
+
+        signals = WorkerSignals(self, "eventsReady")
+
+        def build():
+            index.events()
+            if not sip.isdeleted(self):
+                signals.eventsReady.emit()
+        self._signals = signals
+        self._builder = ThreadPoolExecutor(max_workers=1)
+        self._builder.submit(build)
+
+    def shutdown(self):
+        """Stop the worker building the events, if any."""
+        if self._builder is not None:
+            self._builder.shutdown(wait=False)
+
+    def show_date(self, date):
+        """
+        Center the chart on date (in cycles), moving its range if needed.
+        """
+        drawing = self.drawing()
+        sim = drawing._sim
+        start, end = drawing.date_range()
+        if not start <= date <= end:
+            span = end - start
+            limit = min(sim.now(), sim.duration)
+            start = int(max(0, min(date - span / 2, limit - span)))
+            self.set_config(start, start + span, drawing._selected_items)
+        self.scroll_to_date(date)
+
+    def show_event(self, direction):
+        """
+        Show the next (direction > 0) or previous deadline miss, abort or
+        overhead spike of the rows of the chart.
+        """
+        event = self.drawing().next_event(*(self.visible_dates() +
+                                            (direction,)))
+        if event is None:
+            return
+        date, c = event
+        self.show_date(date)
+        self.scroll_to_row(c)
+
+    def configure(self):
+        drawing = self.drawing()
+        start, end = drawing.date_range()
+        gc = GanttConfigure(drawing._sim, start, end,
+                            drawing._selected_items, drawing._index)
+        if gc.exec_():
+            self.set_config(gc.get_start_date(), gc.get_end_date(),
+                            gc.get_selected_items())
 
     def saveImg(self):
-        imageFile = QFileDialog.getSaveFileName(
-            filter="*.png",
-            caption="Image file name")[0]
+        from .GanttExport import EXPORT_FILTERS
+
+        imageFile, selected = QFileDialog.getSaveFileName(
+            filter=";;".join(name for name, _ in EXPORT_FILTERS),
+            caption="Image file name")
         if imageFile:
-            if str(imageFile[-4:]) != ".png":
-                imageFile += ".png"
-            self._image[0].save(str(imageFile))
+            if not imageFile.lower().endswith(
+                    tuple(ext for _, ext in EXPORT_FILTERS)):
+                imageFile += dict(EXPORT_FILTERS)[selected]
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                filenames = self.export_image(str(imageFile))
+            finally:
+                QApplication.restoreOverrideCursor()
+            if len(filenames) > 1:
+                QMessageBox.information(
+                    self, "Save",
+                    "The chart is too large for a single image, it was "
+                    "saved as %d images:\n%s" % (len(filenames),
+                                                  "\n".join(filenames)))
+
+    def export_image(self, filename):
+        """
+        Export the whole chart at the zoom of the widget and return the list
+        of the files written.
+        """
+        from .GanttExport import export_gantt
+
+        drawing = self.drawing()
+        start, end = drawing.date_range()
+        return export_gantt(drawing._sim, filename, start, end,
+                            drawing._selected_items, drawing.zoom_factor(),
+                            drawing._index)
+
+
+class GanttCanvas(QWidget, GanttDrawing):
+    updated = pyqtSignal()
+    # Number of rows of the index built and total number of rows to build.
+    progress = pyqtSignal(int, int)
+    rowBuilt = pyqtSignal(int, object)
+    eventsReady = pyqtSignal()
+    jobSelected = pyqtSignal(object)
+    tileRendered = pyqtSignal(int, int, int, QImage)
+
+    def __init__(self, sim, config, parent=None, lazy=True, index=None):
+        super(GanttCanvas, self).__init__(parent)
+        self.init_drawing(sim, config, index)
+        # In lazy mode, only the tiles that are actually exposed are
+        # rendered, and they are kept in a bounded LRU cache. The rows of the
+        # index and the tiles are built by worker threads. Each worker
+        # checks the generation of its request and gives up when it is not
+        # the current one anymore, or when the canvas is shut down.
+        self._lazy = lazy
+        self._closed = False
+        self._tiles = OrderedDict()
+        self._pending = set()
+        self._generation = 0
+        self._renderer = ThreadPoolExecutor()
+        self.tileRendered.connect(self.add_tile)
+        self._build_generation = 0
+        self._build_total = 0
+        self._builder = ThreadPoolExecutor(max_workers=1)
+        self.rowBuilt.connect(self.row_built)
+        self._signals = WorkerSignals(self, "rowBuilt", "tileRendered",
+                                      "eventsReady")
+        self._image = []
+        # Selected job: its JobTable, its index and its segments.
+        self._selection = None
+        # Previous rendering (width of the time axis and tiles or images)
+        # shown stretched while the user is zooming.
+        self._stale = None
+        self._zoom_timer = QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(ZOOM_DELAY)
+        self._zoom_timer.timeout.connect(self._update)
+        self.plot()
 
-    def zoomDown(self):
-        self._vwidth = int(self._vwidth / 1.2)
-        if self._vwidth < 200:
-            self._vwidth = 200
+    def plot(self):
         self._width = self._vwidth + 40
+        self._height = 20 + 80 * len(self._selected_items)
+        self._stale = None
+        self._selection = None
+        self.build_index()
         self._update()
 
-    def zoomUp(self):
-        self._vwidth = 	int(self._vwidth * 1.2)
+    def build_index(self):
+        """
+        Build the missing rows of the index in the background. The rows
+        being built are drawn empty until they are ready. Then the other
+        rows and the events are built, if they are not already.
+        """
+        self._build_generation += 1
+        items = [x for x in self.rows() if not self._index.built(x)]
+        if not self._lazy:
+            items = []
+        self._loading = frozenset(items)
+        self._build_total = len(items)
+        self.progress.emit(0, len(items))
+        if self._closed:
+            return
+        if items or (self._lazy and not self._index.events_ready()):
+            self._builder.submit(self.build_rows, self._build_generation,
+                                 items)
+
+    def build_rows(self, generation, items):
+        for item in items:
+            if generation != self._build_generation:
+                return
+            self._index.build(item)
+            if not self.alive():
+                return
+            self._signals.rowBuilt.emit(generation, item)
+        if self._index.events_ready():
+            return
+        sim = self._index.sim
+        for item in sim.processors + sim.task_list:
+            if generation != self._build_generation:
+                return
+            self._index.build(item)
+        self._index.events()
+        if self.alive():
+            self._signals.eventsReady.emit()
+
+    def alive(self):
+        """Whether the workers may still emit the signals of the canvas."""
+        return not self._closed and not sip.isdeleted(self)
+
+    def cancel_tiles(self):
+        """Drop the tiles being rendered, when the chart is hidden."""
+        self._generation += 1
+        self._pending.clear()
+
+    def shutdown(self):
+        """Stop the workers, when the canvas is about to be deleted."""
+        self._closed = True
+        self._build_generation += 1
+        self.cancel_tiles()
+        self._renderer.shutdown(wait=False)
+        self._builder.shutdown(wait=False)
+
+    def finish_build(self):
+        """Build the remaining rows of the index in the calling thread."""
+        if not self._loading:
+            return
+        self._build_generation += 1
+        for item in self.rows():
+            if item in self._loading:
+                self._index.build(item)
+        self._loading = frozenset()
+        self.progress.emit(*self.build_progress())
+        self._update()
+
+    def build_progress(self):
+        return self._build_total - len(self._loading), self._build_total
+
+    def row_built(self, generation, item):
+        if generation != self._build_generation:
+            return
+        self._loading = self._loading - {item}
+        self.progress.emit(*self.build_progress())
+        # Render again the tiles of the row, the labels of its axis
+        # overflow on the next row.
+        c = self.rows().index(item)
+        first = (c * 80) // TILE_HEIGHT
+        last = (c * 80 + 100) // TILE_HEIGHT
+        for key in [k for k in self._tiles if first <= k[1] <= last]:
+            del self._tiles[key]
+        self._generation += 1
+        self._pending.clear()
+        self.update()
+
+    def set_range(self, start_date, end_date):
+        """Show the dates from start_date to end_date (in cycles)."""
+        self.set_dates(start_date, end_date)
+        self.plot()
+
+    def paintEvent(self, event):
+        qp = QPainter(self)
+        dirtyRect = event.rect()
+        if self._lazy:
+            self.paint_tiles(qp, dirtyRect)
+        elif self._stale is not None:
+            self.paint_stale(qp, dirtyRect)
+        else:
+            for i in range(dirtyRect.left() // IMAGE_WIDTH,
+                           dirtyRect.right() // IMAGE_WIDTH + 1):
+                rect = dirtyRect.intersected(
+                    QRect(i * IMAGE_WIDTH, 0, IMAGE_WIDTH, self._height))
+                qp.drawImage(rect, self._image[i],
+                             rect.translated(-i * IMAGE_WIDTH, 0))
+        if self._selection and not self._zoom_timer.isActive():
+            self.paint_selection(qp)
+
+    def paint_selection(self, qp):
+        """Frame the execution segments of the selected job."""
+        table, k, segments = self._selection
+        rows = dict((item, c) for c, item in enumerate(self.rows()))
+        cpus = dict((p.identifier, p) for p in self._sim.processors)
+        rects = []
+        for i in segments.tolist():
+            x1 = table.seg_start[i]
+            x2 = min(table.seg_stop[i], self._end_date)
+            for item in (table.jobs[k].task, cpus.get(table.seg_cpu[i])):
+                if item in rows:
+                    rect = self.rect_graph(x1, x2, rows[item])
+                    if rect:
+                        rects.append(rect)
+        qp.save()
+        qp.setPen(QPen(QColor(0, 0, 0), 2))
+        qp.setBrush(Qt.NoBrush)
+        qp.drawRects(rects)
+        qp.restore()
+
+    def event(self, event):
+        if event.type() == QEvent.ToolTip:
+            hit = self.job_at(event.pos())
+            if hit:
+                QToolTip.showText(event.globalPos(), self.job_info(*hit), self)
+            else:
+                QToolTip.hideText()
+                event.ignore()
+            return True
+        return QWidget.event(self, event)
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton:
+            return QWidget.mousePressEvent(self, event)
+        hit = self.job_at(event.pos())
+        if hit:
+            table, k = hit
+            self._selection = (table, k, numpy.flatnonzero(table.seg_job == k))
+            self.jobSelected.emit(table.jobs[k])
+        else:
+            self._selection = None
+        self.update()
+
+    def paint_tiles(self, qp, rect):
+        if self._zoom_timer.isActive():
+            self.paint_stale(qp, rect)
+            return
+        for tx in range(rect.left() // TILE_WIDTH,
+                        rect.right() // TILE_WIDTH + 1):
+            for ty in range(rect.top() // TILE_HEIGHT,
+                            rect.bottom() // TILE_HEIGHT + 1):
+                key = (tx, ty)
+                image = self._tiles.get(key)
+                if image is not None:
+                    self._tiles.move_to_end(key)
+                    qp.drawImage(tx * TILE_WIDTH, ty * TILE_HEIGHT, image)
+                    continue
+                # Show the previous rendering, if any, until the tile is
+                # ready.
+                self.request_tile(key)
+                tile = self.tile_rect(tx, ty).intersected(rect)
+                if self._stale is not None:
+                    self.paint_stale(qp, tile)
+                else:
+                    qp.fillRect(tile, QColor(235, 235, 235))
+
+    def request_tile(self, key):
+        if key in self._pending or self._closed:
+            return
+        self._pending.add(key)
+        self._renderer.submit(self.render_tile, self._generation, key)
+
+    def render_tile(self, generation, key):
+        if generation != self._generation or not self.alive():
+            return
+        image = self.render_image(self.tile_rect(*key))
+        if generation != self._generation or not self.alive():
+            return
+        self._signals.tileRendered.emit(generation, key[0], key[1], image)
+
+    def add_tile(self, generation, tx, ty, image):
+        if generation != self._generation:
+            return
+        key = (tx, ty)
+        self._pending.discard(key)
+        self._tiles[key] = image
+        while len(self._tiles) > TILE_CACHE_SIZE:
+            self._tiles.popitem(last=False)
+        if self._stale is not None and not self._pending:
+            self._stale = None
+            self.update()
+        else:
+            self.update(self.tile_rect(tx, ty))
+
+    def paint_stale(self, qp, rect):
+        """
+        Paint the previous rendering stretched to the current zoom. The
+        origin of the time axis stays in place.
+        """
+        vwidth, images = self._stale
+        scale = self._vwidth / float(vwidth)
+        qp.save()
+        qp.fillRect(rect, QColor(235, 235, 235))
+        qp.setClipRect(rect)
+        qp.translate(20, 0)
+        qp.scale(scale, 1)
+        qp.translate(-20, 0)
+        left = 20 + (rect.left() - 20) / scale
+        right = 20 + (rect.right() + 1 - 20) / scale
+        if self._lazy:
+            for (tx, ty), image in images.items():
+                if (tx * TILE_WIDTH < right and
+                        (tx + 1) * TILE_WIDTH > left):
+                    qp.drawImage(tx * TILE_WIDTH, ty * TILE_HEIGHT, image)
+        else:
+            for i, image in enumerate(images):
+                if i * IMAGE_WIDTH < right and (i + 1) * IMAGE_WIDTH > left:
+                    qp.drawImage(i * IMAGE_WIDTH, 0, image)
+        qp.restore()
+
+    def tile_rect(self, tx, ty):
+        return QRect(tx * TILE_WIDTH, ty * TILE_HEIGHT, TILE_WIDTH,
+                     TILE_HEIGHT)
+
+    def set_zoom(self, zoom):
+        """Draw the chart at zoom pixels per cycle."""
+        self._vwidth = self.fit_width(zoom)
         self._width = self._vwidth + 40
         self._update()
 
-    def create_qimage(self):
-        total_width = 0
-        images = []
-        while total_width < self._width:
-            w = min(self._width - total_width, 2 ** 15)
-            image = QImage(w, self._height, QImage.Format_ARGB32)
-            image.fill(QColor(235, 235, 235, 255))
-            total_width += w
-            images.append(image)
-        return images
+    def zoomDown(self):
+        self.zoom(self.fit_width(self.zoom_factor() / 1.2))
 
-    def _update(self):
+    def zoomUp(self):
+        self.zoom(self.fit_width(self.zoom_factor() * 1.2))
+
+    def zoom(self, vwidth):
+        """
+        Change the width of the time axis. The current rendering is kept
+        and stretched, the chart is rendered again once no zoom happened
+        for ZOOM_DELAY ms.
+        """
+        if vwidth == self._vwidth:
+            return
+        if self._stale is None:
+            self._stale = (self._vwidth,
+                           self._tiles if self._lazy else self._image)
+            self._tiles = OrderedDict()
+        # The tiles being rendered are at the previous zoom.
+        self._generation += 1
+        self._pending.clear()
+        self._vwidth = vwidth
+        self._width = self._vwidth + 40
+        self.resize_canvas()
+        self.update()
+        self._zoom_timer.start()
+
+    def create_qimage(self):
+        """
+        Rasterize the whole chart into images of at most IMAGE_WIDTH pixels
+        wide. Each image has its own painter and they are rendered
+        concurrently.
+        """
+        rects = [QRect(x, 0, min(self._width - x, IMAGE_WIDTH), self._height)
+                 for x in range(0, self._width, IMAGE_WIDTH)]
+        with ThreadPoolExecutor() as executor:
+            return list(executor.map(self.render_image, rects))
+
+    def resize_canvas(self):
         QWidget.setFixedWidth(self, self._width)
         QWidget.setFixedHeight(self, self._height)
         QWidget.setSizePolicy(self,
@@ -364,65 +1342,395 @@ class GanttCanvas(QWidget):
 
         QWidget.updateGeometry(self)
 
-        qp = QPainter()
-        self._image = self.create_qimage()
-        for image in self._image:
-            qp.begin(self._image[0])
-            #qp.setRenderHint(QPainter.Antialiasing)
-            self.plot_gantt(
-                None, qp, self._sim, self._start_date, self._end_date)
-            qp.end()
-
-    def configure(self):
-        gc = GanttConfigure(self._sim, self._start_date, self._end_date)
-        if gc.exec_():
-            self._start_date = gc.get_start_date()
-            self._end_date = gc.get_end_date()
-            self._selected_items = gc.get_selected_items()
-        self.plot()
+    def _update(self):
+        self.resize_canvas()
+
+        self._zoom_timer.stop()
+        self._generation += 1
+        self._pending.clear()
+        self._tiles.clear()
+        if self._lazy:
+            # The previous rendering is dropped once the new tiles are ready.
+            self.update()
+        else:
+            self._stale = None
+            self._image = self.create_qimage()
+        self.updated.emit()
+
+    def show_events(self, shown):
+        """Draw the deadline misses, aborts and overhead spikes or not."""
+        self._show_events = shown
+        if not self._lazy:
+            # The chart is rendered right away, in this thread.
+            self._index.events()
+        self._update()
 
 
 class GanttToolBar(QToolBar):
-    def __init__(self, parent, canvas):
+    """
+    Toolbar of a widget that shows the chart: view provides GanttActions,
+    zoomUp, zoomDown and show_events. The actions on the events are
+    enabled once they are built.
+    """
+    def __init__(self, parent, view):
         QToolBar.__init__(self, parent)
-        self._canvas = canvas
+        self._view = view
         self.addAction(QApplication.style().standardIcon(QStyle.SP_DialogSaveButton),
-                       "Save", canvas.saveImg)
-        self.addAction("Zoom +", canvas.zoomUp)
-        self.addAction("Zoom -", canvas.zoomDown)
-        self.addAction("Configure", canvas.configure)
+                       "Save", view.saveImg)
+        self.addAction("Zoom +", view.zoomUp)
+        self.addAction("Zoom -", view.zoomDown)
+        self.addAction("Configure", view.configure)
+        self.addSeparator()
+        previous = self.addAction("Previous miss",
+                                  lambda: view.show_event(-1))
+        next_ = self.addAction("Next miss", lambda: view.show_event(1))
+        events = self.addAction("Misses")
+        events.setToolTip("Highlight the deadline misses, aborts and "
+                          "overhead spikes")
+        events.setCheckable(True)
+        events.toggled.connect(view.show_events)
+        self._event_actions = (previous, next_, events)
+        view.eventsReady.connect(self.enable_events)
+        # The events may have been built before the connection.
+        if view.events_ready():
+            self.enable_events()
+        else:
+            for action in self._event_actions:
+                action.setEnabled(False)
 
+    def enable_events(self):
+        for action in self._event_actions:
+            action.setEnabled(True)
 
-class Gantt(QWidget):
-    def __init__(self, sim, conf):
+
+class GanttRowHeader(QWidget):
+    """
+    Names of the rows drawn over the left side of the scroll area, so that
+    they stay visible when the chart is scrolled horizontally.
+    """
+    def __init__(self, canvas, parent):
+        QWidget.__init__(self, parent)
+        self._canvas = canvas
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+
+    def paintEvent(self, event):
+        qp = QPainter(self)
+        offset = self._canvas.mapTo(self.parentWidget(), QPoint(0, 0)).y()
+        qp.translate(0, offset)
+        rect = event.rect().translated(0, -offset)
+        for c, item in enumerate(self._canvas.rows()):
+            if c * 80 > rect.bottom() or (c + 1) * 80 < rect.top():
+                continue
+            # Leave the labels of the axis below the row uncovered.
+            area = QRect(0, c * 80 + 5, 19, 60)
+            qp.setClipRect(area)
+            qp.fillRect(area, QColor(235, 235, 235))
+            self._canvas.plot_name(qp, item.name, c)
+
+
+class GanttOverview(QWidget):
+    """
+    Strip summarizing the whole simulation: the utilization of each
+    processor from white (idle) to dark blue (busy) and the deadline misses
+    in red. The dates shown by the chart are framed. Clicking or dragging on
+    the strip emits the date under the mouse (in cycles).
+    """
+    dateClicked = pyqtSignal(float)
+    overviewReady = pyqtSignal(object)
+
+    def __init__(self, sim, index, parent=None):
+        QWidget.__init__(self, parent)
+        self._sim = sim
+        self._image = None
+        self._misses = None
+        self._view = None
+        self.setFixedHeight(8 * len(sim.processors) + 8)
+        self.setCursor(Qt.PointingHandCursor)
+        self.overviewReady.connect(self.set_overview)
+        self._signals = WorkerSignals(self, "overviewReady")
+        self._executor = None
+        if index._overview is not None:
+            self.set_overview(index._overview)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._executor.submit(self.build_overview, index)
+
+    def build_overview(self, index):
+        overview = index.overview()
+        if not sip.isdeleted(self):
+            self._signals.overviewReady.emit(overview)
+
+    def shutdown(self):
+        """Stop the worker building the overview, if any."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def set_overview(self, overview):
+        self._overview = overview
+        # One pixel per bin and per processor, scaled when painted.
+        busy = numpy.clip(overview.utilization, 0, 1)
+        red = (255 * (1 - busy)).astype(numpy.uint32)
+        blue = (255 - 105 * busy).astype(numpy.uint32)
+        self._pixels = numpy.ascontiguousarray(
+            0xff000000 | red << 16 | red << 8 | blue, dtype=numpy.uint32)
+        rows, bins = self._pixels.shape
+        self._image = QImage(self._pixels.data, bins, rows, bins * 4,
+                             QImage.Format_RGB32)
+        self._misses = numpy.nonzero(overview.misses)[0]
+        self.update()
+
+    def set_view(self, start_date, end_date):
+        """Frame the dates from start_date to end_date (in cycles)."""
+        self._view = (start_date, end_date)
+        self.update()
+
+    def convX(self, date):
+        return date * self.width() / float(self._overview.end_date)
+
+    def paintEvent(self, event):
+        qp = QPainter(self)
+        qp.fillRect(self.rect(), QColor(235, 235, 235))
+        if self._image is None:
+            return
+        height = self.height() - 8
+        qp.drawImage(QRectF(0, 0, self.width(), height), self._image)
+
+        scale = self.width() / float(len(self._overview.misses))
+        qp.setPen(QColor(255, 0, 0))
+        qp.drawLines([QLineF((b + 0.5) * scale, height + 1,
+                             (b + 0.5) * scale, height + 7)
+                      for b in self._misses.tolist()])
+
+        if self._view:
+            x1 = self.convX(self._view[0])
+            x2 = self.convX(self._view[1])
+            qp.setPen(QColor(0, 0, 0))
+            qp.setBrush(QColor(255, 255, 255, 60))
+            qp.drawRect(QRectF(x1, 0, max(1, x2 - x1), self.height() - 1))
+
+    def mousePressEvent(self, event):
+        self.mouseMoveEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self._image is None or not event.buttons() & Qt.LeftButton:
+            return
+        x = min(max(event.pos().x(), 0), self.width())
+        self.dateClicked.emit(
+            x * self._overview.end_date / float(self.width()))
+
+
+class Gantt(QWidget, GanttActions):
+    eventsReady = pyqtSignal()
+
+    def __init__(self, sim, conf, index=None):
         QWidget.__init__(self)
         self.setWindowTitle("Gantt chart")
+        self._sim = sim
         layout1 = QVBoxLayout(self)
         self.setLayout(layout1)
 
-        canvas = GanttCanvas(sim, conf)
+        index = index or GanttIndex(sim)
+        canvas = GanttCanvas(sim, conf, index=index)
+        self._canvas = canvas
+        canvas.eventsReady.connect(self.eventsReady)
+
+        layout1.addWidget(GanttToolBar(self, self))
+
+        self._progress_bar = QProgressBar(self)
+        self._progress_bar.setFormat("Building rows %v/%m")
+        layout1.addWidget(self._progress_bar)
+        canvas.progress.connect(self.updateProgressBar)
+        self.updateProgressBar(*canvas.build_progress())
 
-        layout1.addWidget(GanttToolBar(self, canvas))
+        self._overview = GanttOverview(sim, index, self)
+        self._overview.dateClicked.connect(self.show_date)
+        layout1.addWidget(self._overview)
 
         scrollArea = QScrollArea(self)
         layout1.addWidget(scrollArea)
         scrollArea.setWidgetResizable(True)
+        self._scroll_area = scrollArea
 
         viewport = QWidget()
         scrollArea.setWidget(viewport)
         layout = QVBoxLayout(viewport)
         layout.addWidget(canvas)
 
+        self._header = GanttRowHeader(canvas, scrollArea.viewport())
+        for bar in (scrollArea.horizontalScrollBar(),
+                    scrollArea.verticalScrollBar()):
+            bar.valueChanged.connect(self.update_header)
+            bar.rangeChanged.connect(self.update_header)
+            bar.valueChanged.connect(self.update_overview)
+            bar.rangeChanged.connect(self.update_overview)
+        canvas.updated.connect(self.update_header)
+        canvas.updated.connect(self.update_overview)
+        canvas.installEventFilter(self)
+
+    def updateProgressBar(self, done, total):
+        self._progress_bar.setMaximum(total)
+        self._progress_bar.setValue(done)
+        self._progress_bar.setVisible(done < total)
+
+    def visible_dates(self):
+        viewport = self._scroll_area.viewport()
+        x = self._canvas.mapFrom(viewport, QPoint(0, 0)).x()
+        start, end = self._canvas.date_range()
+        return (max(start, self._canvas.convDate(x)),
+                min(end, self._canvas.convDate(x + viewport.width())))
+
+    def update_overview(self):
+        self._overview.set_view(*self.visible_dates())
+
+    def drawing(self):
+        return self._canvas
+
+    def set_config(self, start_date, end_date, selected_items):
+        canvas = self._canvas
+        canvas.set_dates(start_date, end_date)
+        canvas._selected_items = selected_items
+        canvas.plot()
+        # Let the scroll area take the new size into account.
+        self._scroll_area.widget().layout().activate()
+        QApplication.sendPostedEvents()
+
+    def scroll_to_date(self, date):
+        viewport = self._scroll_area.viewport()
+        bar = self._scroll_area.horizontalScrollBar()
+        bar.setValue(int(self._canvas.convDateToX(date)) -
+                     viewport.width() // 2)
+
+    def scroll_to_row(self, c):
+        y = self._canvas.mapTo(self._scroll_area.widget(),
+                               QPoint(0, c * 80 + 40)).y()
+        x = (self._scroll_area.horizontalScrollBar().value() +
+             self._scroll_area.viewport().width() // 2)
+        self._scroll_area.ensureVisible(x, y, 0, 50)
+
+    def export_image(self, filename):
+        from .GanttExport import export
+
+        # The canvas is exported as shown, with its events layer.
+        return export(self._canvas, filename)
+
+    def zoomUp(self):
+        self._canvas.zoomUp()
+
+    def zoomDown(self):
+        self._canvas.zoomDown()
+
+    def show_events(self, shown):
+        self._canvas.show_events(shown)
+
+    def update_header(self):
+        viewport = self._scroll_area.viewport()
+        pos = self._canvas.mapTo(viewport, QPoint(0, 0))
+        # The canvas draws the names itself until they are scrolled out.
+        self._header.setVisible(pos.x() < 0)
+        self._header.setGeometry(0, 0, 19, viewport.height())
+        self._header.raise_()
+        self._header.update()
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Move, QEvent.Resize):
+            self.update_header()
+            self.update_overview()
+        elif (event.type() == QEvent.Wheel and
+                event.modifiers() & Qt.ControlModifier):
+            self.zoom_at(event.angleDelta().y(), event.pos().x())
+            return True
+        return False
+
+    def zoom_at(self, delta, x):
+        """
+        Zoom in (delta > 0) or out around the abscissa x of the canvas, which
+        stays under the mouse.
+        """
+        if delta == 0:
+            return
+        canvas = self._canvas
+        date = canvas.convDate(x)
+        if delta > 0:
+            canvas.zoomUp()
+        else:
+            canvas.zoomDown()
+        # Let the scroll area take the new width into account before
+        # moving the view.
+        self._scroll_area.widget().layout().activate()
+        QApplication.sendPostedEvents()
+        bar = self._scroll_area.horizontalScrollBar()
+        bar.setValue(bar.value() + int(round(canvas.convDateToX(date))) - x)
+
+    def resizeEvent(self, event):
+        QWidget.resizeEvent(self, event)
+        self.update_header()
+
     def closeEvent(self, event):
+        self._canvas.cancel_tiles()
         self.parent().hide()
         event.ignore()
 
+    def shutdown(self):
+        self._canvas.shutdown()
+        self._overview.shutdown()
+
+    def deleteLater(self):
+        self.shutdown()
+        QWidget.deleteLater(self)
+
+
+class GanttViewWindow(QWidget):
+    """
+    Window of a view of the chart that scrolls itself (see GanttScene and
+    GanttGL), with its toolbar and its overview.
+    """
+    def __init__(self, view_class, sim, conf, index=None):
+        QWidget.__init__(self)
+        self.setWindowTitle("Gantt chart")
+        layout = QVBoxLayout(self)
+        index = index or GanttIndex(sim)
+        view = view_class(sim, conf, index, self)
+        self._view = view
+        layout.addWidget(GanttToolBar(self, view))
+        self._overview = GanttOverview(sim, index, self)
+        self._overview.dateClicked.connect(view.show_date)
+        layout.addWidget(self._overview)
+        layout.addWidget(view)
+        for bar in (view.horizontalScrollBar(), view.verticalScrollBar()):
+            bar.valueChanged.connect(self.update_overview)
+            bar.rangeChanged.connect(self.update_overview)
+
+    def update_overview(self):
+        self._overview.set_view(*self._view.visible_dates())
+
+    def closeEvent(self, event):
+        self.parent().hide()
+        event.ignore()
+
+    def shutdown(self):
+        self._view.shutdown()
+        self._overview.shutdown()
+
+    def deleteLater(self):
+        self.shutdown()
+        QWidget.deleteLater(self)
+
 
-def create_gantt_window(sim):
-    gc = GanttConfigure(sim, 0, min(sim.now(), sim.duration) // sim.cycles_per_ms)
+def create_gantt_window(sim, index=None):
+    gc = GanttConfigure(sim, 0, min(sim.now(), sim.duration), index=index)
     if gc.exec_():
         start_date = gc.get_start_date()
         end_date = gc.get_end_date()
         selected_items = gc.get_selected_items()
-        return Gantt(sim, (start_date, end_date, selected_items))
+        backend = QSettings().value("ganttBackend", "tiles")
+        if backend == "opengl":
+            from .GanttGL import GanttGLWindow, opengl_available
+            if opengl_available():
+                return GanttGLWindow(
+                    sim, (start_date, end_date, selected_items), index)
+        elif backend == "scene":
+            from .GanttScene import GanttSceneWindow
+            return GanttSceneWindow(
+                sim, (start_date, end_date, selected_items), index)
+        return Gantt(sim, (start_date, end_date, selected_items), index)
     return None
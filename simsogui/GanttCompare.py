@@ -0,0 +1,252 @@
+"""
+Comparison of the Gantt charts of two simulations.
+
+The rows of both simulations are stacked in a single scroll area and drawn
+on the same time axis, so that scrolling and zooming move both charts
+together. Each chart uses the index of its own run. The dates are in cycles
+of the first run, converted for the second one if its cycles differ. The
+windows during which the processors of the two runs do not execute the
+same task are highlighted on both charts and on a strip above them.
+"""
+import numpy
+
+from PyQt5.QtCore import pyqtSignal, Qt, QEvent, QPoint, QRectF
+from PyQt5.QtGui import QColor, QPainter
+from PyQt5.QtWidgets import (QApplication, QLabel, QScrollArea, QToolBar,
+                             QVBoxLayout, QWidget)
+
+from .Gantt import GanttCanvas, GanttConfigure, pixel_spans
+from .GanttIndex import GanttIndex, divergence
+
+DIVERGENCE_COLOR = QColor(255, 0, 0, 40)
+
+
+class GanttCompareCanvas(GanttCanvas):
+    """Gantt chart with the divergence windows (in cycles) highlighted."""
+    def __init__(self, sim, config, index, windows, parent=None):
+        self._windows = windows
+        GanttCanvas.__init__(self, sim, config, parent, index=index)
+
+    def paintEvent(self, event):
+        GanttCanvas.paintEvent(self, event)
+        rect = event.rect()
+        starts, ends = self._windows
+        i = numpy.searchsorted(ends, self.convDate(rect.left()), 'right')
+        j = numpy.searchsorted(starts, self.convDate(rect.right() + 1),
+                               'right')
+        if i >= j:
+            return
+        x1 = self.convDateToX(numpy.maximum(starts[i:j], self._start_date))
+        x2 = self.convDateToX(numpy.minimum(ends[i:j], self._end_date))
+        qp = QPainter(self)
+        for left, right in pixel_spans(x1, x2):
+            qp.fillRect(QRectF(left, rect.top(), right - left,
+                               rect.height()), DIVERGENCE_COLOR)
+
+
+class DivergenceStrip(QWidget):
+    """
+    Divergence windows over the common duration of the two runs, with the
+    dates shown by the charts framed. Clicking on the strip emits the date
+    under the mouse (in cycles).
+    """
+    dateClicked = pyqtSignal(float)
+
+    def __init__(self, windows, duration, parent=None):
+        QWidget.__init__(self, parent)
+        self._windows = windows
+        self._duration = float(max(1, duration))
+        self._view = None
+        self.setFixedHeight(10)
+        self.setCursor(Qt.PointingHandCursor)
+
+    def set_view(self, start_date, end_date):
+        self._view = (start_date, end_date)
+        self.update()
+
+    def convX(self, date):
+        return date * self.width() / self._duration
+
+    def paintEvent(self, event):
+        qp = QPainter(self)
+        qp.fillRect(self.rect(), QColor(255, 255, 255))
+        starts, ends = self._windows
+        for x1, x2 in pixel_spans(self.convX(starts), self.convX(ends)):
+            qp.fillRect(QRectF(x1, 0, x2 - x1, self.height()),
+                        QColor(255, 0, 0))
+        if self._view:
+            x1 = self.convX(self._view[0])
+            x2 = self.convX(self._view[1])
+            qp.setPen(QColor(0, 0, 0))
+            qp.drawRect(QRectF(x1, 0, max(1, x2 - x1), self.height() - 1))
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            x = min(max(event.pos().x(), 0), self.width())
+            self.dateClicked.emit(x * self._duration / self.width())
+
+
+class GanttCompare(QWidget):
+    def __init__(self, sims, names, indices=(None, None)):
+        QWidget.__init__(self)
+        self.setWindowTitle("Gantt comparison: %s / %s" % tuple(names))
+        self._sims = sims
+        indices = [index or GanttIndex(sim)
+                   for sim, index in zip(sims, indices)]
+        self._windows = divergence(*indices)
+        # Cycles of each run per cycle of the first one.
+        self._scales = [sim.cycles_per_ms / float(sims[0].cycles_per_ms)
+                        for sim in sims]
+        self._limit = int(min(min(sim.now(), sim.duration) / scale
+                              for sim, scale in zip(sims, self._scales)))
+
+        layout = QVBoxLayout(self)
+        toolbar = QToolBar(self)
+        toolbar.addAction("Zoom +", lambda: self.zoom_at(1))
+        toolbar.addAction("Zoom -", lambda: self.zoom_at(-1))
+        toolbar.addAction("Configure", self.configure)
+        toolbar.addSeparator()
+        toolbar.addAction("Previous difference",
+                          lambda: self.show_difference(-1))
+        toolbar.addAction("Next difference", lambda: self.show_difference(1))
+        layout.addWidget(toolbar)
+
+        self._strip = DivergenceStrip(self._windows, self._limit, self)
+        self._strip.dateClicked.connect(self.show_date)
+        layout.addWidget(self._strip)
+
+        scrollArea = QScrollArea(self)
+        scrollArea.setWidgetResizable(True)
+        layout.addWidget(scrollArea)
+        self._scroll_area = scrollArea
+        viewport = QWidget()
+        scrollArea.setWidget(viewport)
+        charts = QVBoxLayout(viewport)
+
+        self._canvases = []
+        for sim, name, index, scale in zip(sims, names, indices,
+                                           self._scales):
+            charts.addWidget(QLabel(name))
+            canvas = GanttCompareCanvas(
+                sim, (0, int(round(self._limit * scale)),
+                      sim.processors + sim.task_list),
+                index, [dates * scale for dates in self._windows])
+            canvas.installEventFilter(self)
+            charts.addWidget(canvas)
+            self._canvases.append(canvas)
+        charts.addStretch()
+
+        for bar in (scrollArea.horizontalScrollBar(),
+                    scrollArea.verticalScrollBar()):
+            bar.valueChanged.connect(self.update_strip)
+            bar.rangeChanged.connect(self.update_strip)
+
+    def update_strip(self):
+        canvas = self._canvases[0]
+        viewport = self._scroll_area.viewport()
+        x = canvas.mapFrom(viewport, QPoint(0, 0)).x()
+        start, end = canvas.date_range()
+        self._strip.set_view(
+            max(start, canvas.convDate(x)),
+            min(end, canvas.convDate(x + viewport.width())))
+
+    def set_range(self, start, end):
+        """Show the dates from start to end on both charts."""
+        for c, scale in zip(self._canvases, self._scales):
+            c.set_range(int(round(start * scale)), int(round(end * scale)))
+
+    def relayout(self):
+        self._scroll_area.widget().layout().activate()
+        QApplication.sendPostedEvents()
+
+    def show_date(self, date):
+        """
+        Center the charts on date (in cycles), moving their range if needed.
+        """
+        canvas = self._canvases[0]
+        start, end = canvas.date_range()
+        if not start <= date <= end:
+            span = end - start
+            start = int(max(0, min(date - span / 2, self._limit - span)))
+            self.set_range(start, start + span)
+            self.relayout()
+        viewport = self._scroll_area.viewport()
+        self._scroll_area.horizontalScrollBar().setValue(
+            int(canvas.convDateToX(date)) - viewport.width() // 2)
+
+    def show_difference(self, direction):
+        """
+        Center the charts on the beginning of the next (direction > 0) or
+        previous divergence window.
+        """
+        canvas = self._canvases[0]
+        viewport = self._scroll_area.viewport()
+        x = canvas.mapFrom(viewport, QPoint(viewport.width() // 2, 0)).x()
+        # Dates closer than a pixel are the current one.
+        center = canvas.convDate(x)
+        pixel = canvas.convDate(x + 1) - center
+        starts = self._windows[0]
+        if direction > 0:
+            k = numpy.searchsorted(starts, center + pixel, 'left')
+        else:
+            k = numpy.searchsorted(starts, center - pixel, 'right') - 1
+        if 0 <= k < len(starts):
+            self.show_date(float(starts[k]))
+
+    def zoom_at(self, delta, x=None):
+        """
+        Zoom both charts in (delta > 0) or out, keeping the date at the
+        abscissa x of the first canvas (by default the center of the view)
+        in place.
+        """
+        canvas = self._canvases[0]
+        viewport = self._scroll_area.viewport()
+        if x is None:
+            x = canvas.mapFrom(viewport, QPoint(viewport.width() // 2, 0)).x()
+        date = canvas.convDate(x)
+        for c in self._canvases:
+            if delta > 0:
+                c.zoomUp()
+            elif delta < 0:
+                c.zoomDown()
+        self.relayout()
+        bar = self._scroll_area.horizontalScrollBar()
+        bar.setValue(bar.value() + int(round(canvas.convDateToX(date))) - x)
+
+    def configure(self):
+        canvas = self._canvases[0]
+        start, end = canvas.date_range()
+        gc = GanttConfigure(self._sims[0], start, end,
+                            canvas._selected_items, canvas._index)
+        if not gc.exec_():
+            return
+        start = gc.get_start_date()
+        end = min(gc.get_end_date(), self._limit)
+        # The rows of the second run are selected by name.
+        names = set(item.name for item in gc.get_selected_items())
+        for c, sim in zip(self._canvases, self._sims):
+            c._selected_items = set(x for x in sim.processors + sim.task_list
+                                    if x.name in names)
+        self.set_range(start, max(start + 1, end))
+        self.relayout()
+        self.update_strip()
+
+    def eventFilter(self, obj, event):
+        if (event.type() == QEvent.Wheel and
+                event.modifiers() & Qt.ControlModifier):
+            # Both canvases share the abscissas.
+            self.zoom_at(event.angleDelta().y(), event.pos().x())
+            return True
+        return False
+
+    def resizeEvent(self, event):
+        QWidget.resizeEvent(self, event)
+        self.update_strip()
+
+    def shutdown(self):
+        for canvas in self._canvases:
+            canvas.shutdown()
+
+    def deleteLater(self):
+        self.shutdown()
+        QWidget.deleteLater(self)
@@ -0,0 +1,197 @@
+"""
+Export of the Gantt chart to PNG, SVG or PDF files.
+
+The chart is drawn by GanttCanvas, which does not need to be shown: this
+module can be used from a script with the offscreen platform of Qt:
+
+    python -m simsogui.GanttExport simulation.xml gantt.pdf
+
+The chart is drawn strip by strip, so that only one strip is rasterized at
+a time. The vector formats use the same levels of detail as the screen:
+the segments smaller than a pixel are merged.
+"""
+import optparse
+import os
+import sys
+
+from PyQt5.QtCore import QMarginsF, QRect, QSize, QSizeF
+from PyQt5.QtGui import QPageSize, QPainter, QPdfWriter
+from PyQt5.QtSvg import QSvgGenerator
+
+from .Gantt import IMAGE_WIDTH, TILE_HEIGHT, TILE_WIDTH
+
+# Maximum number of pixels of a PNG image, the largest QImage with 32 bits
+# per pixel (its size in bytes is an int). It is also at most IMAGE_WIDTH
+# pixels wide, the widest image the chart is rasterized into.
+PNG_PIXELS = (2 ** 31 - 1) // 4
+
+# Maximum size (in pixels) of a page of a PDF, which cannot exceed 200
+# inches.
+PDF_PAGE_WIDTH = 16 * TILE_WIDTH
+PDF_PAGE_HEIGHT = 30 * TILE_HEIGHT
+
+# Resolution of the vector formats, the one of the screen.
+RESOLUTION = 96
+
+EXPORT_FILTERS = [("PNG image (*.png)", ".png"),
+                  ("SVG image (*.svg)", ".svg"),
+                  ("PDF document (*.pdf)", ".pdf")]
+
+
+def strips(canvas, width, height=None):
+    """
+    Rectangles of at most width x height pixels covering the chart, row by
+    row.
+    """
+    chart_width, chart_height = canvas.chart_size()
+    height = height or chart_height
+    return [QRect(x, y, min(width, chart_width - x),
+                  min(height, chart_height - y))
+            for y in range(0, chart_height, height)
+            for x in range(0, chart_width, width)]
+
+
+def export_png(canvas, filename):
+    """
+    Save the chart as a PNG image. Only a chart too large for a single image
+    is saved as numbered strips (name_0.png, name_1.png...).
+    """
+    chart_width, chart_height = canvas.chart_size()
+    width = max(TILE_WIDTH, min(IMAGE_WIDTH, PNG_PIXELS // chart_height))
+    rects = strips(canvas, width)
+    if len(rects) == 1:
+        filenames = [filename]
+    else:
+        base, extension = os.path.splitext(filename)
+        filenames = ["%s_%d%s" % (base, i, extension)
+                     for i in range(len(rects))]
+    for rect, name in zip(rects, filenames):
+        canvas.render_image(rect).save(name)
+    return filenames
+
+
+def export_svg(canvas, filename):
+    """Save the chart as a single SVG image."""
+    width, height = canvas.chart_size()
+    generator = QSvgGenerator()
+    generator.setFileName(filename)
+    generator.setTitle("Gantt chart")
+    generator.setResolution(RESOLUTION)
+    generator.setSize(QSize(width, height))
+    generator.setViewBox(QRect(0, 0, width, height))
+    qp = QPainter(generator)
+    for rect in strips(canvas, PDF_PAGE_WIDTH):
+        canvas.paint_chart(qp, rect)
+    qp.end()
+    return [filename]
+
+
+def export_pdf(canvas, filename):
+    """Save the chart as a PDF document, with one page per strip."""
+    writer = QPdfWriter(filename)
+    writer.setTitle("Gantt chart")
+    writer.setResolution(RESOLUTION)
+    qp = None
+    for rect in strips(canvas, PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT):
+        writer.setPageSize(QPageSize(
+            QSizeF(rect.width(), rect.height()) * 72.0 / RESOLUTION,
+            QPageSize.Point))
+        if qp is None:
+            writer.setPageMargins(QMarginsF())
+            qp = QPainter(writer)
+        else:
+            writer.newPage()
+        qp.save()
+        qp.translate(-rect.x(), -rect.y())
+        canvas.paint_chart(qp, rect)
+        qp.restore()
+    qp.end()
+    return [filename]
+
+
+def export(canvas, filename):
+    """
+    Save the chart drawn by canvas in the format given by the extension of
+    filename. Return the list of the files written.
+    """
+    exporters = {".png": export_png, ".svg": export_svg, ".pdf": export_pdf}
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in exporters:
+        raise ValueError("Unknown image format: %s" % extension)
+    canvas.finish_build()
+    return exporters[extension](canvas, filename)
+
+
+def export_gantt(sim, filename, start_date=None, end_date=None, items=None,
+                 zoom=None, index=None):
+    """
+    Save the Gantt chart of the simulation sim from start_date to end_date
+    (in cycles, the whole simulation by default) with the rows of items
+    (all the processors and tasks by default), at zoom pixels per cycle. A
+    QApplication must exist but no window is shown.
+    """
+    from .Gantt import GanttCanvas
+
+    if start_date is None:
+        start_date = 0
+    if end_date is None:
+        end_date = min(sim.now(), sim.duration)
+    if items is None:
+        items = sim.processors + sim.task_list
+    canvas = GanttCanvas(sim, (start_date, end_date, items), index=index)
+    if zoom:
+        canvas.set_zoom(zoom)
+    return export(canvas, filename)
+
+
+def main(args=None):
+    parser = optparse.OptionParser(
+        usage="%prog [options] simulation.xml output.(png|svg|pdf)")
+    parser.add_option('-s', '--start', type='float', dest='start',
+                      help='first date of the chart (ms)')
+    parser.add_option('-e', '--end', type='float', dest='end',
+                      help='last date of the chart (ms)')
+    parser.add_option('-z', '--zoom', type='float', dest='zoom',
+                      help='pixels per ms (default: 10, more for short '
+                      'charts)')
+    parser.add_option('-r', '--rows', dest='rows',
+                      help='comma-separated names of the processors and '
+                      'tasks to show (default: all)')
+    (opts, args) = parser.parse_args(args)
+    if len(args) != 2:
+        parser.error("expected a simulation file and an output file")
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from simso.configuration import Configuration
+    from simso.core import Model
+
+    app = QApplication(sys.argv[:1])
+    # Also the creator of the PDF documents.
+    app.setOrganizationName("SimSo")
+    app.setApplicationName("SimSo")
+    configuration = Configuration(args[0])
+    configuration.check_all()
+    model = Model(configuration)
+    model.run_model()
+
+    items = None
+    if opts.rows:
+        names = opts.rows.split(',')
+        items = [x for x in model.processors + model.task_list
+                 if x.name in names]
+    # The options are in ms, the chart in cycles.
+    cycles_per_ms = model.cycles_per_ms
+    start, end, zoom = opts.start, opts.end, opts.zoom
+    if start is not None:
+        start = int(round(start * cycles_per_ms))
+    if end is not None:
+        end = int(round(end * cycles_per_ms))
+    if zoom:
+        zoom /= float(cycles_per_ms)
+    for filename in export_gantt(model, args[1], start, end, items, zoom):
+        print(filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+"""
+Gantt chart drawn with OpenGL.
+
+The execution intervals of each row are converted once into a vertex buffer
+(two triangles per interval, with the color of its task) and the levels of
+detail are uploaded the same way the first time they are needed. Zooming
+and panning only change the uniforms of the shaders, so drawing a row is a
+single draw call over the range of intervals found by the binary search of
+GanttIndex. The axes, the names, the arrows and the circles are drawn over
+the bars with QPainter, by the code of GanttDrawing.
+
+Only OpenGL 2.0 (or OpenGL ES 2.0) and GLSL 1.10 are used. When no
+suitable context can be created or the shaders do not compile, the bars are
+drawn with QPainter, as by the other views.
+"""
+import numpy
+
+from PyQt5.QtCore import pyqtSignal, Qt, QEvent, QPoint, QRect, qWarning
+from PyQt5.QtGui import (QColor, QOpenGLBuffer, QOpenGLContext, QOpenGLShader,
+                         QOpenGLShaderProgram, QOpenGLVersionProfile, QPainter,
+                         QVector2D)
+from PyQt5.QtWidgets import QAbstractScrollArea, QOpenGLWidget, QToolTip
+
+from .Gantt import GanttActions, GanttDrawing, GanttViewWindow
+from .GanttIndex import JobTable
+
+from simso.core import ProcEvent
+
+GL_TRIANGLES = 0x0004
+GL_DEPTH_TEST = 0x0B71
+GL_STENCIL_TEST = 0x0B90
+GL_SCISSOR_TEST = 0x0C11
+GL_BLEND = 0x0BE2
+GL_ONE = 1
+GL_ONE_MINUS_SRC_ALPHA = 0x0303
+GL_UNSIGNED_BYTE = 0x1401
+GL_FLOAT = 0x1406
+
+# The dates of the vertices are split into a number of chunks of CHUNK
+# cycles (about 1 ms at the default 1,000,000 cycles per ms) and an offset in
+# the chunk, so that single precision floats, with their 24 bits of mantissa,
+# stay exact to a sixteenth of a cycle whatever the length of the simulation.
+CHUNK = 2 ** 20
+
+# One vertex: offset in its chunk (cycles), ordinate in the row, chunk,
+# color.
+# The alpha channel of the color encodes the pattern of the brush.
+VERTEX = numpy.dtype([('x', numpy.float32), ('y', numpy.float32),
+                      ('chunk', numpy.float32), ('color', numpy.uint8, 4)])
+
+PATTERN_ALPHA = {Qt.SolidPattern: 255, Qt.Dense2Pattern: 128,
+                 Qt.BDiagPattern: 0}
+
+VERTEX_SHADER = """
+uniform vec2 u_size;
+uniform vec2 u_origin;
+uniform float u_zoom;
+uniform float u_left_chunk;
+uniform float u_left;
+attribute vec3 a_position;
+attribute vec4 a_color;
+varying vec4 v_color;
+
+void main()
+{
+    // QPainter fills the pixels whose center is in (x1, x2], OpenGL the
+    // ones in [x1, x2): the small shift makes the edges that fall exactly
+    // on a pixel center go to the same side.
+    float x = ((a_position.z - u_left_chunk) * %(chunk).1f
+               + (a_position.x - u_left)) * u_zoom + u_origin.x + 0.004;
+    float y = a_position.y + u_origin.y;
+    gl_Position = vec4(2.0 * x / u_size.x - 1.0, 1.0 - 2.0 * y / u_size.y,
+                       0.0, 1.0);
+    v_color = a_color;
+}
+""" % {"chunk": CHUNK}
+
+# The patterns are the ones of QPainter, anchored at the origin of the
+# chart: Qt::Dense2Pattern leaves one pixel out of 8, Qt::BDiagPattern
+# keeps one diagonal out of 8.
+FRAGMENT_SHADER = """
+uniform vec2 u_pattern_origin;
+uniform float u_height;
+uniform float u_ratio;
+varying vec4 v_color;
+
+void main()
+{
+    vec2 p = floor(vec2(gl_FragCoord.x, u_height - gl_FragCoord.y) / u_ratio)
+             + u_pattern_origin;
+    if (v_color.a < 0.25) {
+        if (mod(p.x + p.y, 8.0) != 7.0)
+            discard;
+    } else if (v_color.a < 0.75) {
+        float hole = mod(p.y, 4.0) == 0.0 ? 3.0 : 1.0;
+        if (mod(p.y, 2.0) == 0.0 && mod(p.x, 4.0) == hole)
+            discard;
+    }
+    gl_FragColor = vec4(v_color.rgb * %(alpha)f, %(alpha)f);
+}
+""" % {"alpha": 200 / 255.0}
+
+
+def opengl_available():
+    """Whether an OpenGL 2.0 or OpenGL ES 2.0 context can be created."""
+    context = QOpenGLContext()
+    if not context.create():
+        return False
+    return context.format().majorVersion() >= 2
+
+
+def bar_vertices(x1, x2, heights, colors):
+    """
+    Vertices of the bars from x1 to x2 (in cycles from the start of the chart)
+    of a row, heights pixels high, as two triangles each. colors gives the
+    RGBA color of each bar.
+    """
+    n = len(x1)
+    x2 = numpy.maximum(x2, x1)
+    xs = numpy.stack((x1, x2, x1, x1, x2, x2), axis=1)
+    top = 50.0 - heights
+    ys = numpy.stack((top, top, [50.0] * n, [50.0] * n, top, [50.0] * n),
+                     axis=1)
+    chunks = numpy.floor(xs / CHUNK)
+    vertices = numpy.empty((n, 6), dtype=VERTEX)
+    vertices['x'] = xs - chunks * CHUNK
+    vertices['y'] = ys
+    vertices['chunk'] = chunks
+    vertices['color'] = colors[:, None, :]
+    return vertices.ravel()
+
+
+class GanttGLView(QAbstractScrollArea, GanttDrawing, GanttActions):
+    """
+    Chart drawn in a QOpenGLWidget used as the viewport of a scroll area.
+    """
+    eventsReady = pyqtSignal()
+
+    def __init__(self, sim, config, index=None, parent=None):
+        QAbstractScrollArea.__init__(self, parent)
+        self.init_drawing(sim, config, index)
+        self.setViewport(QOpenGLWidget())
+        self._gl = None
+        self._program = None
+        self._initialized = False
+        # Vertex buffers by (item, width of the level of detail or None).
+        self._buffers = {}
+        self._palette = None
+        self.plot()
+        self.build_events()
+
+    def plot(self):
+        self._width = self._vwidth + 40
+        self._height = 20 + 80 * len(self._selected_items)
+        self.update_scroll_bars()
+        self.viewport().update()
+
+    def update_scroll_bars(self):
+        size = self.viewport().size()
+        for bar, length, page in (
+                (self.horizontalScrollBar(), self._width, size.width()),
+                (self.verticalScrollBar(), self._height, size.height())):
+            bar.setRange(0, max(0, length - page))
+            bar.setPageStep(page)
+            bar.setSingleStep(20)
+
+    def scroll_position(self):
+        return QPoint(self.horizontalScrollBar().value(),
+                      self.verticalScrollBar().value())
+
+    def init_gl(self):
+        """
+        Compile the shaders. If that fails, the bars are drawn with
+        QPainter.
+        """
+        self._initialized = True
+        context = self.viewport().context()
+        if context is None or not context.isValid():
+            return
+        if context.isOpenGLES():
+            gl = context.versionFunctions()
+            header = "#version 100\nprecision highp float;\n"
+        else:
+            profile = QOpenGLVersionProfile()
+            profile.setVersion(2, 0)
+            gl = context.versionFunctions(profile)
+            header = "#version 110\n"
+        if gl is None or not gl.initializeOpenGLFunctions():
+            return
+        program = QOpenGLShaderProgram(self)
+        if not (program.addShaderFromSourceCode(
+                    QOpenGLShader.Vertex, header + VERTEX_SHADER) and
+                program.addShaderFromSourceCode(
+                    QOpenGLShader.Fragment, header + FRAGMENT_SHADER) and
+                program.link()):
+            qWarning("OpenGL Gantt disabled, the bars are drawn with "
+                     "QPainter: " + program.log())
+            return
+        self._gl = gl
+        self._program = program
+        context.aboutToBeDestroyed.connect(self.release_buffers)
+
+    def release_buffers(self):
+        """Free the vertex buffers, e.g. when the drawn dates change."""
+        if self._buffers:
+            self.viewport().makeCurrent()
+            for buf, _ in self._buffers.values():
+                buf.destroy()
+            self.viewport().doneCurrent()
+        self._buffers = {}
+
+    def palette_colors(self):
+        """
+        RGBA colors of the bars by identifier of task + 1 (0 for the
+        overheads), with the pattern in the alpha channel.
+        """
+        if self._palette is None:
+            identifiers = [task.identifier for task in self._sim.task_list]
+            self._palette = numpy.zeros((max(identifiers + [0]) + 2, 4),
+                                        dtype=numpy.uint8)
+            for i in [-1] + identifiers:
+                brush = self.get_brush(i)
+                color = brush.color()
+                self._palette[i + 1] = (color.red(), color.green(),
+                                        color.blue(),
+                                        PATTERN_ALPHA.get(brush.style(), 255))
+        return self._palette
+
+    def row_vertices(self, item, row, level):
+        """
+        Vertices of all the bars of the row of item, or of its level of
+        detail, in the order of the intervals of the row.
+        """
+        if level:
+            width, occupancy, dominant, _ = level
+            heights = numpy.ceil(occupancy * 40.0 / width)
+            # Consecutive identical bars are merged.
+            change = numpy.flatnonzero((heights[1:] != heights[:-1])
+                                       | (dominant[1:] != dominant[:-1])) + 1
+            first = numpy.concatenate(([0], change))
+            last = numpy.append(change, len(heights))
+            keep = heights[first] > 0
+            first, last = first[keep], last[keep]
+            heights = heights[first]
+            tasks = numpy.maximum(-1, dominant[first])
+            x1 = first * width
+            x2 = last * width
+        elif isinstance(row, JobTable):
+            x1 = row.seg_start
+            x2 = row.seg_stop
+            heights = numpy.full(len(x1), 40.0)
+            tasks = numpy.full(len(x1), item.identifier)
+        else:
+            x1 = row.start
+            x2 = row.end
+            heights = numpy.full(len(x1), 40.0)
+            tasks = numpy.where(row.kind == ProcEvent.RUN, row.task, -1)
+        x1 = numpy.maximum(x1, self._start_date) - self._start_date
+        x2 = numpy.minimum(x2, self._end_date) - self._start_date
+        return bar_vertices(x1, x2, heights, self.palette_colors()[tasks + 1])
+
+    def create_buffer(self, key, row, level):
+        """
+        Upload the bars of row, or of its level of detail, and return the
+        buffer and its number of bars.
+        """
+        vertices = self.row_vertices(key[0], row, level)
+        buf = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        buf.create()
+        buf.bind()
+        buf.allocate(vertices, vertices.nbytes)
+        buf.release()
+        self._buffers[key] = (buf, len(vertices) // 6)
+        return self._buffers[key]
+
+    def uniforms(self, c, scroll, size, ratio):
+        """
+        Values of the uniforms of the shaders to draw the row c when the
+        viewport of the given size shows the chart from scroll.
+        """
+        zoom = self.zoom_factor()
+        left = scroll.x() / zoom
+        left_chunk = left // CHUNK
+        x, y = self.origGraph(c)
+        return {"u_size": (size.width(), size.height()),
+                "u_origin": (x, y - scroll.y()),
+                "u_zoom": zoom,
+                "u_left_chunk": float(left_chunk),
+                "u_left": left - left_chunk * CHUNK,
+                "u_pattern_origin": (scroll.x() % 8, scroll.y() % 8),
+                "u_height": size.height() * ratio,
+                "u_ratio": float(ratio)}
+
+    def plot_bars(self, qp, item, c, view_start, view_end):
+        if self._program is None:
+            return GanttDrawing.plot_bars(self, qp, item, c, view_start,
+                                          view_end)
+        # The whole row is uploaded once, the shaders draw all its
+        # intervals when the levels of detail are too coarse.
+        row, i, j, level = self.bar_range(item, view_start, view_end,
+                                          window=False)
+        key = (item, level[0] if level else None)
+        buf, count = self._buffers.get(key) or \
+            self.create_buffer(key, row, level)
+        if not level:
+            count = j - i
+        else:
+            i = 0
+        if not count:
+            return
+
+        gl = self._gl
+        program = self._program
+        viewport = self.viewport()
+        ratio = viewport.devicePixelRatioF()
+        qp.beginNativePainting()
+        gl.glViewport(0, 0, int(viewport.width() * ratio),
+                      int(viewport.height() * ratio))
+        for capability in (GL_DEPTH_TEST, GL_STENCIL_TEST, GL_SCISSOR_TEST):
+            gl.glDisable(capability)
+        gl.glEnable(GL_BLEND)
+        gl.glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+        program.bind()
+        for name, value in self.uniforms(
+                c, self.scroll_position(), viewport.size(), ratio).items():
+            if isinstance(value, tuple):
+                value = QVector2D(*value)
+            program.setUniformValue(name, value)
+        buf.bind()
+        position = program.attributeLocation("a_position")
+        color = program.attributeLocation("a_color")
+        program.enableAttributeArray(position)
+        program.enableAttributeArray(color)
+        program.setAttributeBuffer(position, GL_FLOAT, 0, 3, VERTEX.itemsize)
+        program.setAttributeBuffer(color, GL_UNSIGNED_BYTE,
+                                   VERTEX.fields['color'][1], 4,
+                                   VERTEX.itemsize)
+        gl.glDrawArrays(GL_TRIANGLES, 6 * i, 6 * count)
+        program.disableAttributeArray(position)
+        program.disableAttributeArray(color)
+        buf.release()
+        program.release()
+        qp.endNativePainting()
+
+    def paintEvent(self, event):
+        if not self._initialized:
+            self.init_gl()
+        qp = QPainter(self.viewport())
+        scroll = self.scroll_position()
+        qp.translate(-scroll)
+        self.paint_chart(qp, event.rect().translated(scroll))
+        qp.translate(scroll)
+        # The names of the rows stay visible when the chart is scrolled.
+        if scroll.x() > 0:
+            qp.translate(0, -scroll.y())
+            for c, item in enumerate(self.rows()):
+                area = QRect(0, c * 80 + 5, 19, 60)
+                qp.setClipRect(area)
+                qp.fillRect(area, QColor(235, 235, 235))
+                self.plot_name(qp, item.name, c)
+        qp.end()
+
+    def resizeEvent(self, event):
+        QAbstractScrollArea.resizeEvent(self, event)
+        self.update_scroll_bars()
+
+    def viewportEvent(self, event):
+        if event.type() == QEvent.ToolTip:
+            hit = self.job_at(event.pos() + self.scroll_position())
+            if hit:
+                QToolTip.showText(event.globalPos(), self.job_info(*hit),
+                                  self)
+            else:
+                QToolTip.hideText()
+            return True
+        return QAbstractScrollArea.viewportEvent(self, event)
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            self.zoom_at(event.angleDelta().y(), event.pos().x())
+        else:
+            QAbstractScrollArea.wheelEvent(self, event)
+
+    def visible_dates(self):
+        x = self.horizontalScrollBar().value()
+        return (max(self._start_date, self.convDate(x)),
+                min(self._end_date,
+                    self.convDate(x + self.viewport().width())))
+
+    def zoom(self, vwidth, x=None):
+        """
+        Change the width of the time axis, keeping the date at the abscissa
+        x of the viewport (by default its center) in place.
+        """
+        if x is None:
+            x = self.viewport().width() // 2
+        bar = self.horizontalScrollBar()
+        date = self.convDate(bar.value() + x)
+        self._vwidth = vwidth
+        self.plot()
+        bar.setValue(int(round(self.convDateToX(date))) - x)
+
+    def zoom_at(self, delta, x):
+        if delta > 0:
+            self.zoom(self.fit_width(self.zoom_factor() * 1.2), x)
+        elif delta < 0:
+            self.zoom(self.fit_width(self.zoom_factor() / 1.2), x)
+
+    def zoomUp(self):
+        self.zoom(self.fit_width(self.zoom_factor() * 1.2))
+
+    def zoomDown(self):
+        self.zoom(self.fit_width(self.zoom_factor() / 1.2))
+
+    def show_events(self, shown):
+        self._show_events = shown
+        self.viewport().update()
+
+    def drawing(self):
+        return self
+
+    def scroll_to_date(self, date):
+        self.horizontalScrollBar().setValue(
+            int(self.convDateToX(date)) - self.viewport().width() // 2)
+
+    def scroll_to_row(self, c):
+        bar = self.verticalScrollBar()
+        height = self.viewport().height()
+        if not bar.value() <= c * 80 <= bar.value() + height - 80:
+            bar.setValue(c * 80 - (height - 80) // 2)
+
+    def set_config(self, start_date, end_date, selected_items):
+        self.set_dates(start_date, end_date)
+        self._selected_items = selected_items
+        self.release_buffers()
+        self.plot()
+
+
+class GanttGLWindow(GanttViewWindow):
+    def __init__(self, sim, conf, index=None):
+        GanttViewWindow.__init__(self, GanttGLView, sim, conf, index)
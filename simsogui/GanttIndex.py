@@ -0,0 +1,649 @@
+"""
+Time-indexed view of the monitors of a simulation.
+
+The monitors of the processors and of the tasks are converted once into
+sorted numpy arrays so that the drawing of a row can start directly at the
+first visible event using a binary search, instead of walking the whole
+history of the simulation. The jobs of each task are summarized in a
+JobTable that can also be used to compute per-job metrics.
+
+All the dates are expressed in cycles.
+"""
+import numpy
+
+from simso.core import JobEvent, ProcEvent
+
+# Number of bins of the finest level of detail of the pyramids.
+LOD_BINS = 2 ** 14
+
+# Number of bins of the overview of the whole simulation.
+OVERVIEW_BINS = 1024
+
+# Kinds of the events of EventIndex.
+EVENT_MISS, EVENT_ABORT, EVENT_OVERHEAD = range(3)
+
+# An overhead is a spike when it is more than SPIKE_FACTOR times longer than
+# the median overhead of the simulation.
+SPIKE_FACTOR = 4
+
+
+def busy_time(start, end, dates):
+    """
+    Total length of the disjoint intervals [start, end) sorted by date that
+    is before each of the dates.
+    """
+    if not len(start):
+        return numpy.zeros(len(dates))
+    length = end - start
+    cumulated = numpy.concatenate(([0], numpy.cumsum(length)))
+    # Number of intervals started before each date, the last of them may
+    # not be finished.
+    k = numpy.searchsorted(start, dates, 'right')
+    last = numpy.maximum(k - 1, 0)
+    partial = numpy.clip(dates - start[last], 0, length[last])
+    return cumulated[last] + numpy.where(k > 0, partial, 0)
+
+
+def nearest(values, date, tolerance):
+    """
+    Return the index of the element of the sorted array values that is the
+    nearest to date, or -1 if none is within tolerance.
+    """
+    k = numpy.searchsorted(values, date)
+    best = -1
+    for i in (k - 1, k):
+        if 0 <= i < len(values) and abs(values[i] - date) <= tolerance:
+            if best < 0 or abs(values[i] - date) < abs(values[best] - date):
+                best = i
+    return int(best)
+
+
+def run_states(start, end, task, dates):
+    """
+    Return what a processor whose busy intervals are [start, end) with the
+    tasks task (-1 for the overheads) is doing at each of the sorted dates:
+    the identifier of the task, -1 for an overhead or -2 when idle.
+    """
+    if not len(start):
+        return numpy.full(len(dates), -2, dtype=numpy.int32)
+    k = numpy.searchsorted(start, dates, 'right') - 1
+    last = numpy.maximum(k, 0)
+    inside = (k >= 0) & (dates < end[last])
+    return numpy.where(inside, task[last], -2)
+
+
+def merge_intervals(starts, ends):
+    """
+    Merge the overlapping or contiguous intervals [starts, ends), which
+    must be sorted by start.
+    """
+    if not len(starts):
+        return starts, ends
+    reach = numpy.maximum.accumulate(ends)
+    first = numpy.ones(len(starts), dtype=bool)
+    first[1:] = starts[1:] > reach[:-1]
+    return (starts[first],
+            numpy.maximum.reduceat(ends, numpy.flatnonzero(first)))
+
+
+def divergence(index, other):
+    """
+    Return the windows (starts, ends), in cycles of the simulation of
+    index, during which the processors of the simulations of index and
+    other (paired in the order of their lists) do not run the same task.
+    The runs are compared at every date where one of them changes.
+    """
+    scale = index.sim.cycles_per_ms / float(other.sim.cycles_per_ms)
+    starts, ends = [], []
+    for processor, other_processor in zip(index.sim.processors,
+                                          other.sim.processors):
+        rows = [(index.processor(processor), 1.0),
+                (other.processor(other_processor), scale)]
+        intervals = [(row.start * scale, row.end * scale, row.task)
+                     for row, scale in rows]
+        dates = numpy.unique(numpy.concatenate(
+            [x for start, end, _ in intervals for x in (start, end)]))
+        if len(dates) < 2:
+            continue
+        left = dates[:-1]
+        differ = (run_states(*(intervals[0] + (left,))) !=
+                  run_states(*(intervals[1] + (left,))))
+        starts.append(left[differ])
+        ends.append(dates[1:][differ])
+    if not starts:
+        return numpy.zeros(0), numpy.zeros(0)
+    starts = numpy.concatenate(starts)
+    ends = numpy.concatenate(ends)
+    order = numpy.argsort(starts, kind='stable')
+    return merge_intervals(starts[order], ends[order])
+
+
+def bin_intervals(start, end, task, width, first, nbins):
+    """
+    Return the busy time and the task of the longest slice of the nbins
+    bins of width cycles that start at the bin first, for the disjoint
+    intervals [start, end) with the tasks task, sorted by date.
+    """
+    occupancy = numpy.zeros(nbins, dtype=numpy.int64)
+    dominant = numpy.full(nbins, -1, dtype=numpy.int32)
+    origin = first * width
+    start = numpy.maximum(start, origin) - origin
+    end = numpy.minimum(end, origin + nbins * width) - origin
+    inside = end > start
+    start, end, task = start[inside], end[inside], task[inside]
+
+    first = start // width
+    last = (end - 1) // width
+
+    # Bins that are entirely covered by an interval.
+    count = numpy.maximum(last - first - 1, 0)
+    offsets = numpy.arange(count.sum()) - numpy.repeat(
+        numpy.cumsum(count) - count, count)
+    full = numpy.repeat(first + 1, count) + offsets
+    occupancy[full] = width
+    dominant[full] = numpy.repeat(task, count)
+
+    # Slices at both ends of the intervals.
+    same = first == last
+    bins = numpy.concatenate((first, last[~same]))
+    weights = numpy.concatenate((
+        numpy.where(same, end - start, (first + 1) * width - start),
+        (end - last * width)[~same]))
+    tasks = numpy.concatenate((task, task[~same]))
+    numpy.add.at(occupancy, bins, weights)
+    order = numpy.lexsort((-weights, bins))
+    bins = bins[order]
+    longest = numpy.ones(len(bins), dtype=bool)
+    longest[1:] = bins[1:] != bins[:-1]
+    dominant[bins[longest]] = tasks[order][longest]
+    return occupancy, dominant
+
+
+class IntervalPyramid(object):
+    """
+    Multi-resolution summary of disjoint intervals sorted by date. The level
+    k splits the simulation into bins of `width * 2 ** k` cycles and gives,
+    for each bin, the busy time (`occupancy`) and the task of the longest
+    slice in it (`dominant`). At the coarser levels, the dominant task of a
+    bin is the one of its busiest half. A level is a tuple (width,
+    occupancy, dominant, first), first being the number of the first bin.
+    """
+    def __init__(self, start, end, task, end_date):
+        self._start = start
+        self._end = end
+        self._task = task
+        width = max(1, -(-int(end_date) // LOD_BINS))
+        nbins = max(1, -(-int(end_date) // width))
+        occupancy, dominant = bin_intervals(start, end, task, width, 0,
+                                            nbins)
+
+        self.levels = [(width, occupancy, dominant, 0)]
+        while len(occupancy) > 1:
+            if len(occupancy) % 2:
+                occupancy = numpy.append(occupancy, 0)
+                dominant = numpy.append(dominant, -1)
+            left = occupancy[0::2]
+            right = occupancy[1::2]
+            dominant = numpy.where(left >= right, dominant[0::2],
+                                   dominant[1::2])
+            occupancy = left + right
+            width *= 2
+            self.levels.append((width, occupancy, dominant, 0))
+
+    def level(self, cycles_per_pixel, view_start=None, view_end=None):
+        """
+        Return the finest level whose bins are at least one pixel wide. If
+        the finest level is already wider than a pixel, return a level of
+        bins of one pixel computed for the dates between view_start and
+        view_end only, or None if they are not given.
+        """
+        if cycles_per_pixel < self.levels[0][0]:
+            if view_start is None or view_end is None:
+                return None
+            width = max(1, int(cycles_per_pixel))
+            first = int(view_start) // width
+            nbins = int(view_end) // width - first + 1
+            i = numpy.searchsorted(self._end, first * width, 'right')
+            j = numpy.searchsorted(self._start, (first + nbins) * width)
+            occupancy, dominant = bin_intervals(
+                self._start[i:j], self._end[i:j], self._task[i:j], width,
+                first, nbins)
+            return (width, occupancy, dominant, first)
+        for level in self.levels:
+            if level[0] >= cycles_per_pixel:
+                return level
+        return self.levels[-1]
+
+
+class ProcessorIntervals(object):
+    """
+    Busy intervals of a processor. `start`, `end`, `kind` and `task` are
+    arrays of the same length sorted by date. `kind` is either
+    ProcEvent.RUN or ProcEvent.OVERHEAD, `task` is the identifier of the
+    running task (-1 for the overheads).
+    """
+    def __init__(self, processor, end_date):
+        starts, ends, kinds, tasks = [], [], [], []
+        current = None
+        x1 = 0
+        for date, evt in processor.monitor:
+            if evt.event == ProcEvent.RUN:
+                key = (ProcEvent.RUN, evt.args.task.identifier)
+            elif evt.event == ProcEvent.OVERHEAD:
+                key = (ProcEvent.OVERHEAD, -1)
+            else:
+                key = None
+
+            if key != current:
+                if current and date > x1:
+                    starts.append(x1)
+                    ends.append(date)
+                    kinds.append(current[0])
+                    tasks.append(current[1])
+                current = key
+                x1 = date
+
+        if current and end_date > x1:
+            starts.append(x1)
+            ends.append(end_date)
+            kinds.append(current[0])
+            tasks.append(current[1])
+
+        self.start = numpy.array(starts, dtype=numpy.int64)
+        self.end = numpy.array(ends, dtype=numpy.int64)
+        self.kind = numpy.array(kinds, dtype=numpy.int8)
+        self.task = numpy.array(tasks, dtype=numpy.int32)
+        self._end_date = end_date
+        self._pyramid = None
+
+    def __len__(self):
+        return len(self.start)
+
+    def lod(self, cycles_per_pixel, view_start=None, view_end=None):
+        """
+        Level of detail to use when a pixel represents cycles_per_pixel
+        cycles (see IntervalPyramid.level). The overheads are reported with
+        the task -1.
+        """
+        if self._pyramid is None:
+            self._pyramid = IntervalPyramid(self.start, self.end, self.task,
+                                            self._end_date)
+        return self._pyramid.level(cycles_per_pixel, view_start,
+                                   view_end)
+
+    def search(self, start_date, end_date):
+        """
+        Return the range (i, j) of the intervals that intersect
+        [start_date, end_date].
+        """
+        i = numpy.searchsorted(self.end, start_date, 'right')
+        j = numpy.searchsorted(self.start, end_date, 'right')
+        return int(i), int(max(i, j))
+
+
+class JobTable(object):
+    """
+    Jobs of a task, built in a single pass over its monitor.
+
+    The arrays `activation`, `start`, `end`, `deadline`, `missed`,
+    `aborted`, `computation_time`, `preemptions` and `migrations` have one
+    entry per job, in activation order, and `jobs` is the list of the
+    corresponding Job objects. `start` and `end` are -1 when the job did
+    not start or finish before the end of the simulation.
+
+    The execution segments are described by `seg_start`, `seg_stop`,
+    `seg_job` (index of the job) and `seg_cpu` (identifier of the
+    processor), sorted by date. `ends` and `ends_aborted` give the end
+    dates of the jobs sorted by date, and `ends_job` the corresponding jobs.
+
+    The table covers the whole run and is used by the Gantt chart and its
+    tooltips. The results tables keep the metrics of simso.core.results,
+    which follow the observation window and count the start of a job from
+    its activation when no other job of the task is pending, not from its
+    first execution.
+    """
+    def __init__(self, task, end_date, cycles_per_ms):
+        self._identifier = task.identifier
+        self._end_date = end_date
+        self._pyramid = None
+        self.jobs = []
+        indices = {}
+        activation, start, end, deadline, aborted = [], [], [], [], []
+        seg_start, seg_stop, seg_job, seg_cpu = [], [], [], []
+        # As in simso.core.results, an execution of a job that already ran
+        # after being preempted is a preemption if it is on the processor
+        # of the previous execution of the task, else a migration.
+        executed, preemptions, migrations = [], [], []
+        x1 = running = cpu = None
+        for date, evt in task.monitor:
+            if evt.event == JobEvent.ACTIVATE:
+                indices[evt.job] = len(self.jobs)
+                self.jobs.append(evt.job)
+                activation.append(date)
+                start.append(-1)
+                end.append(-1)
+                deadline.append(
+                    int(round(evt.job.absolute_deadline * cycles_per_ms)))
+                aborted.append(False)
+                executed.append(False)
+                preemptions.append(0)
+                migrations.append(0)
+                continue
+
+            k = indices[evt.job]
+            if x1 is not None and x1 < date:
+                seg_start.append(x1)
+                seg_stop.append(date)
+                seg_job.append(running)
+                seg_cpu.append(cpu)
+                if evt.event != JobEvent.EXECUTE:
+                    executed[running] = True
+            x1 = None
+
+            if evt.event == JobEvent.EXECUTE:
+                previous = cpu
+                x1 = date
+                running = k
+                cpu = evt.cpu.identifier if evt.cpu is not None else -1
+                if start[k] < 0:
+                    start[k] = date
+                if executed[k]:
+                    if cpu == previous:
+                        preemptions[k] += 1
+                    else:
+                        migrations[k] += 1
+            elif evt.event in (JobEvent.TERMINATED, JobEvent.ABORTED):
+                end[k] = date
+                aborted[k] = evt.event == JobEvent.ABORTED
+
+        if x1 is not None and x1 < end_date:
+            seg_start.append(x1)
+            seg_stop.append(end_date)
+            seg_job.append(running)
+            seg_cpu.append(cpu)
+
+        self.activation = numpy.array(activation, dtype=numpy.int64)
+        self.start = numpy.array(start, dtype=numpy.int64)
+        self.end = numpy.array(end, dtype=numpy.int64)
+        self.deadline = numpy.array(deadline, dtype=numpy.int64)
+        self.aborted = numpy.array(aborted, dtype=bool)
+        self.missed = (numpy.where(self.end >= 0, self.end, end_date)
+                       > self.deadline) | self.aborted
+
+        self.seg_start = numpy.array(seg_start, dtype=numpy.int64)
+        self.seg_stop = numpy.array(seg_stop, dtype=numpy.int64)
+        self.seg_job = numpy.array(seg_job, dtype=numpy.int64)
+        self.seg_cpu = numpy.array(seg_cpu, dtype=numpy.int64)
+
+        n = len(self.jobs)
+        self.computation_time = numpy.bincount(
+            self.seg_job, weights=self.seg_stop - self.seg_start,
+            minlength=n).astype(numpy.int64)
+        self.preemptions = numpy.array(preemptions, dtype=numpy.int64)
+        self.migrations = numpy.array(migrations, dtype=numpy.int64)
+
+        order = numpy.argsort(self.end, kind='stable')
+        order = order[self.end[order] >= 0]
+        self.ends = self.end[order]
+        self.ends_aborted = self.aborted[order]
+        self.ends_job = order
+
+    def __len__(self):
+        return len(self.jobs)
+
+    @property
+    def response_time(self):
+        """Response times of the jobs (-1 for the unfinished jobs)."""
+        return numpy.where(self.end >= 0, self.end - self.activation, -1)
+
+    def lod(self, cycles_per_pixel, view_start=None, view_end=None):
+        """
+        Level of detail of the execution segments to use when a pixel
+        represents cycles_per_pixel cycles (see IntervalPyramid.level).
+        """
+        if self._pyramid is None:
+            self._pyramid = IntervalPyramid(
+                self.seg_start, self.seg_stop,
+                numpy.full(len(self.seg_start), self._identifier,
+                           dtype=numpy.int32),
+                self._end_date)
+        return self._pyramid.level(cycles_per_pixel, view_start,
+                                   view_end)
+
+    def search(self, start_date, end_date):
+        """
+        Return the range (i, j) of the execution segments that intersect
+        [start_date, end_date].
+        """
+        i = numpy.searchsorted(self.seg_stop, start_date, 'right')
+        j = numpy.searchsorted(self.seg_start, end_date, 'right')
+        return int(i), int(max(i, j))
+
+    def job_at(self, date, cpu=None):
+        """
+        Return the index of the job executed at date (on the processor whose
+        identifier is cpu, if given) or -1. Only the few segments that start
+        just before date can contain it.
+        """
+        k = int(numpy.searchsorted(self.seg_start, date, 'right')) - 1
+        for i in range(k, max(k - 8, -1), -1):
+            if self.seg_stop[i] > date and (cpu is None or
+                                            self.seg_cpu[i] == cpu):
+                return int(self.seg_job[i])
+        return -1
+
+    def search_jobs(self, start_date, end_date):
+        """
+        Return the range (i, j) of the jobs activated in
+        [start_date, end_date].
+        """
+        i = numpy.searchsorted(self.activation, start_date, 'left')
+        j = numpy.searchsorted(self.activation, end_date, 'right')
+        return int(i), int(max(i, j))
+
+    def search_ends(self, start_date, end_date):
+        """
+        Return the range (i, j) of `ends` that are in [start_date, end_date].
+        """
+        i = numpy.searchsorted(self.ends, start_date, 'left')
+        j = numpy.searchsorted(self.ends, end_date, 'right')
+        return int(i), int(max(i, j))
+
+
+class Overview(object):
+    """
+    Summary of the whole simulation in OVERVIEW_BINS bins of `bin_width`
+    cycles: `utilization` gives the fraction of each bin during which each
+    processor ran a job (one row per processor) and `misses` the number of
+    deadline misses (or aborts) in each bin, dated by the deadline.
+    """
+    def __init__(self, index):
+        sim = index.sim
+        self.end_date = max(1, int(index._end_date))
+        self.bin_width = self.end_date / float(OVERVIEW_BINS)
+        edges = numpy.linspace(0, self.end_date, OVERVIEW_BINS + 1)
+
+        self.utilization = numpy.zeros((len(sim.processors), OVERVIEW_BINS))
+        for k, processor in enumerate(sim.processors):
+            row = index.processor(processor)
+            run = row.kind == ProcEvent.RUN
+            self.utilization[k] = numpy.diff(
+                busy_time(row.start[run], row.end[run], edges)) \
+                / self.bin_width
+
+        self.misses = numpy.zeros(OVERVIEW_BINS, dtype=numpy.int64)
+        for task in sim.task_list:
+            table = index.task(task)
+            dates = table.deadline[table.missed]
+            dates = dates[dates < self.end_date]
+            self.misses += numpy.bincount(
+                (dates / self.bin_width).astype(numpy.int64),
+                minlength=OVERVIEW_BINS)
+
+
+class EventIndex(object):
+    """
+    Deadline misses (dated by their deadline), aborts and overhead spikes of
+    a simulation, sorted by date. The arrays `date`, `end` (end of the
+    overhead, the date for the other events), `kind` and `row` (position of
+    the task or processor in `items`) have one entry per event.
+    """
+    def __init__(self, index):
+        sim = index.sim
+        self.items = sim.processors + sim.task_list
+        self._positions = dict((item, k) for k, item in enumerate(self.items))
+        dates, ends, kinds, rows = [], [], [], []
+
+        def add(date, end, kind, row):
+            dates.append(date)
+            ends.append(end)
+            kinds.append(numpy.full(len(date), kind, dtype=numpy.int8))
+            rows.append(numpy.full(len(date), row, dtype=numpy.int32))
+
+        for task in sim.task_list:
+            table = index.task(task)
+            row = self._positions[task]
+            missed = table.deadline[table.missed & ~table.aborted]
+            add(missed, missed, EVENT_MISS, row)
+            aborts = table.ends[table.ends_aborted]
+            add(aborts, aborts, EVENT_ABORT, row)
+
+        overheads = [(processor, index.processor(processor))
+                     for processor in sim.processors]
+        lengths = numpy.concatenate(
+            [row.end[row.kind == ProcEvent.OVERHEAD] -
+             row.start[row.kind == ProcEvent.OVERHEAD]
+             for _, row in overheads] + [numpy.zeros(0, dtype=numpy.int64)])
+        if len(lengths):
+            threshold = SPIKE_FACTOR * numpy.median(lengths)
+            for processor, row in overheads:
+                spike = ((row.kind == ProcEvent.OVERHEAD) &
+                         (row.end - row.start > threshold))
+                add(row.start[spike], row.end[spike], EVENT_OVERHEAD,
+                    self._positions[processor])
+
+        if dates:
+            date = numpy.concatenate(dates).astype(numpy.int64)
+            order = numpy.argsort(date, kind='stable')
+            self.date = date[order]
+            self.end = numpy.concatenate(ends).astype(numpy.int64)[order]
+            self.kind = numpy.concatenate(kinds)[order]
+            self.row = numpy.concatenate(rows)[order]
+        else:
+            self.date = self.end = numpy.zeros(0, dtype=numpy.int64)
+            self.kind = numpy.zeros(0, dtype=numpy.int8)
+            self.row = numpy.zeros(0, dtype=numpy.int32)
+        # Events of each row, in the order of the dates. The events of a
+        # row do not overlap, so their ends are sorted too.
+        self._by_row = dict((row, numpy.flatnonzero(self.row == row))
+                            for row in numpy.unique(self.row).tolist())
+
+    def __len__(self):
+        return len(self.date)
+
+    def search(self, item, start_date, end_date):
+        """
+        Return the indices of the events of the task or processor item that
+        intersect [start_date, end_date].
+        """
+        k = self._by_row.get(self._positions[item])
+        if k is None:
+            return numpy.zeros(0, dtype=numpy.int64)
+        i = numpy.searchsorted(self.end[k], start_date, 'left')
+        j = numpy.searchsorted(self.date[k], end_date, 'right')
+        return k[i:max(i, j)]
+
+    def next_event(self, date, direction, items=None):
+        """
+        Return the index of the first event after date (direction > 0) or
+        the last one before it, among the events of items (all by
+        default), or -1.
+        """
+        if items is None:
+            dates = self.date
+            k = numpy.arange(len(dates))
+        else:
+            rows = [self._positions[item] for item in items]
+            k = numpy.flatnonzero(numpy.isin(self.row, rows))
+            dates = self.date[k]
+        if direction > 0:
+            i = numpy.searchsorted(dates, date, 'right')
+        else:
+            i = numpy.searchsorted(dates, date, 'left') - 1
+        if 0 <= i < len(k):
+            return int(k[i])
+        return -1
+
+
+class GanttIndex(object):
+    """
+    Lazily built index of the rows of a simulation. The rows are built the
+    first time they are requested and kept for the lifetime of the index,
+    which is meant to be created once at the end of the simulation.
+    """
+    def __init__(self, sim):
+        self.sim = sim
+        self._end_date = sim.now()
+        self._processors = {}
+        self._tasks = {}
+        self._overview = None
+        self._missed_tasks = None
+        self._events = None
+        self._task_ids = dict((task.identifier, task)
+                              for task in sim.task_list)
+
+    def processor(self, processor):
+        row = self._processors.get(processor)
+        if row is None:
+            row = ProcessorIntervals(processor, self._end_date)
+            self._processors[processor] = row
+        return row
+
+    def task(self, task):
+        row = self._tasks.get(task)
+        if row is None:
+            row = JobTable(task, self._end_date, self.sim.cycles_per_ms)
+            self._tasks[task] = row
+        return row
+
+    def overview(self):
+        """
+        Overview of the simulation. Building it builds all the rows, so it
+        is better done in a worker thread right after the simulation.
+        """
+        if self._overview is None:
+            self._overview = Overview(self)
+        return self._overview
+
+    def events(self):
+        """
+        Deadline misses, aborts and overhead spikes. Like the overview, it
+        builds all the rows.
+        """
+        if self._events is None:
+            self._events = EventIndex(self)
+        return self._events
+
+    def events_ready(self):
+        """Whether the events are already built."""
+        return self._events is not None
+
+    def missed_tasks(self):
+        """Set of the tasks with at least one job that missed its deadline."""
+        if self._missed_tasks is None:
+            self._missed_tasks = set(task for task in self.sim.task_list
+                                     if self.task(task).missed.any())
+        return self._missed_tasks
+
+    def task_by_identifier(self, identifier):
+        return self._task_ids.get(identifier)
+
+    def built(self, item):
+        """Whether the row of the processor or task item is already built."""
+        return item in self._processors or item in self._tasks
+
+    def build(self, item):
+        """Build the row of the processor or task item."""
+        if item in self.sim.processors:
+            return self.processor(item)
+        return self.task(item)
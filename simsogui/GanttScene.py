@@ -0,0 +1,303 @@
+"""
+Gantt chart shown by a QGraphicsView.
+
+The time axis of the scene is SCENE_WIDTH units wide whatever the dates
+shown. The scene contains one item per row and per chunk of CHUNK_WIDTH
+units of the time axis, indexed by the BSP tree of the scene, so that only
+the items exposed by the view are painted. Zooming and panning only change
+the transform of the view: the items draw themselves at the resolution of
+the view with the code of GanttDrawing, including its levels of detail,
+and nothing is rasterized in advance. The number of items, and so the
+memory used, only depends on the number of rows.
+"""
+from PyQt5.QtCore import pyqtSignal, Qt, QEvent, QPoint, QRect, QRectF
+from PyQt5.QtGui import QColor, QPainter, QTransform
+from PyQt5.QtWidgets import QGraphicsItem, QGraphicsScene, QGraphicsView, QToolTip, QWidget
+
+from .Gantt import GanttActions, GanttDrawing, GanttViewWindow
+
+# Width of the time axis and of the items of the finest level, in units of
+# the scene. The items of the level k are LEVEL_RATIO ** k times wider, and
+# the view shows the finest level whose items are at least MIN_ITEM_WIDTH
+# pixels wide.
+SCENE_WIDTH = 2 ** 16
+CHUNK_WIDTH = 2048
+LEVEL_RATIO = 4
+MIN_ITEM_WIDTH = 512
+
+
+class GanttSceneDrawing(GanttDrawing):
+    """Drawing of the chart at the zoom of the view."""
+    def __init__(self, sim, config, index=None):
+        self.init_drawing(sim, config, index)
+
+    def set_scale(self, scale):
+        """Draw the chart at scale pixels per unit of the scene."""
+        self._vwidth = SCENE_WIDTH * scale
+
+    def scale(self):
+        return self._vwidth / float(SCENE_WIDTH)
+
+    def scene_width(self):
+        return SCENE_WIDTH
+
+
+class GanttRowItem(QGraphicsItem):
+    """
+    Part of a row of the chart, from the abscissa x (in units of the scene)
+    on width units.
+    """
+    def __init__(self, drawing, row, x, width):
+        QGraphicsItem.__init__(self)
+        self._drawing = drawing
+        self._row = row
+        # The labels of the axis overflow below the row.
+        self._rect = QRectF(x, row * 80, width, 100)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        return self._rect
+
+    def paint(self, qp, option, widget=None):
+        drawing = self._drawing
+        transform = qp.worldTransform()
+        scale = transform.m11()
+        drawing.set_scale(scale)
+        # The abscissa x of the scene is 20 + scale * x in the coordinates
+        # of GanttDrawing at this scale, which are drawn without scaling.
+        exposed = option.exposedRect
+        rect = QRectF(20 + scale * exposed.left(), exposed.top(),
+                      scale * exposed.width(), exposed.height())
+        rect = rect.toAlignedRect()
+        qp.save()
+        qp.setTransform(QTransform.fromTranslate(transform.dx() - 20,
+                                                 transform.dy()))
+        qp.setClipRect(rect)
+        drawing.plot_gantt(qp, drawing._sim, drawing._start_date,
+                           drawing._end_date, rect, (self._row, self._row))
+        qp.restore()
+
+
+class GanttLevel(QGraphicsItem):
+    """Parent, without contents, of the items of a level."""
+    def __init__(self):
+        QGraphicsItem.__init__(self)
+        self.setFlag(QGraphicsItem.ItemHasNoContents)
+
+    def boundingRect(self):
+        return QRectF()
+
+    def paint(self, qp, option, widget=None):
+        pass
+
+
+class GanttScene(QGraphicsScene):
+    """
+    Rows of the chart cut in items at several levels: only one level is
+    visible, so that the number of items painted stays small whatever the
+    zoom.
+    """
+    def __init__(self, drawing, parent=None):
+        QGraphicsScene.__init__(self, parent)
+        self._drawing = drawing
+        self._levels = []
+        self._level = None
+        self._rows = None
+        self.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        self.populate()
+
+    def populate(self):
+        """Create the items, if the number of rows changed."""
+        rows = len(self._drawing.rows())
+        if rows == self._rows:
+            self.update()
+            return
+        self.clear()
+        self._levels = []
+        self._level = None
+        self._rows = rows
+        chunk = CHUNK_WIDTH
+        while True:
+            level = GanttLevel()
+            level.setVisible(False)
+            self.addItem(level)
+            for row in range(rows):
+                for x in range(0, SCENE_WIDTH, chunk):
+                    # The labels at both ends of the axis overflow on the
+                    # margins of the scene.
+                    left = x if x else -SCENE_WIDTH
+                    right = x + chunk if x + chunk < SCENE_WIDTH else \
+                        2 * SCENE_WIDTH
+                    item = GanttRowItem(self._drawing, row, left,
+                                        right - left)
+                    item.setParentItem(level)
+            self._levels.append(level)
+            if chunk >= SCENE_WIDTH:
+                break
+            chunk *= LEVEL_RATIO
+
+    def set_scale(self, scale):
+        """
+        Show the level adapted to the scale of the view, with margins of 20
+        pixels around the time axis.
+        """
+        self.setSceneRect(-20 / scale, 0, SCENE_WIDTH + 40 / scale,
+                          20 + 80 * self._rows)
+        k = 0
+        chunk = CHUNK_WIDTH * scale
+        while chunk < MIN_ITEM_WIDTH and k < len(self._levels) - 1:
+            chunk *= LEVEL_RATIO
+            k += 1
+        if k != self._level:
+            if self._level is not None:
+                self._levels[self._level].setVisible(False)
+            self._levels[k].setVisible(True)
+            self._level = k
+
+
+class GanttSceneHeader(QWidget):
+    """Names of the rows, in the left margin of the view."""
+    def __init__(self, view):
+        QWidget.__init__(self, view)
+        self._view = view
+
+    def paintEvent(self, event):
+        qp = QPainter(self)
+        qp.fillRect(self.rect(), QColor(235, 235, 235))
+        view = self._view
+        qp.translate(0, view.mapFromScene(0, 0).y())
+        for c, item in enumerate(view.drawing().rows()):
+            view.drawing().plot_name(qp, item.name, c)
+
+
+class GanttView(QGraphicsView, GanttActions):
+    eventsReady = pyqtSignal()
+
+    def __init__(self, sim, config, index=None, parent=None):
+        QGraphicsView.__init__(self, parent)
+        self._drawing = GanttSceneDrawing(sim, config, index)
+        self.setScene(GanttScene(self._drawing, self))
+        self.setTransform(QTransform.fromScale(self._drawing.scale(), 1))
+        self.scene().set_scale(self.scale_factor())
+        self.setBackgroundBrush(QColor(235, 235, 235))
+        self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setViewportMargins(20, 0, 0, 0)
+        self._header = GanttSceneHeader(self)
+        self.verticalScrollBar().valueChanged.connect(self._header.update)
+        self._shown = False
+        self.build_events()
+
+    def drawing(self):
+        self._drawing.set_scale(self.scale_factor())
+        return self._drawing
+
+    def scale_factor(self):
+        return self.transform().m11()
+
+    def zoom_factor(self):
+        """Pixels per cycle of the view."""
+        start, end = self._drawing.date_range()
+        return (self._drawing.scene_width() * self.scale_factor()
+                / float(end - start))
+
+    def dateToScene(self, date):
+        start, end = self._drawing.date_range()
+        return ((date - start) * self._drawing.scene_width()
+                / float(end - start))
+
+    def sceneToDate(self, x):
+        start, end = self._drawing.date_range()
+        return start + x * (end - start) / float(self._drawing.scene_width())
+
+    def visible_dates(self):
+        rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        start, end = self._drawing.date_range()
+        return (max(start, self.sceneToDate(rect.left())),
+                min(end, self.sceneToDate(rect.right())))
+
+    def zoom(self, factor):
+        # The width of the chart stays within the limits of GanttDrawing.
+        drawing = self._drawing
+        width = drawing.scene_width() * self.scale_factor()
+        factor = drawing.fit_width(self.zoom_factor() * factor) / width
+        self.scale(factor, 1)
+        self.scene().set_scale(self.scale_factor())
+
+    def zoomUp(self):
+        self.zoom(1.2)
+
+    def zoomDown(self):
+        self.zoom(1 / 1.2)
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            if event.angleDelta().y() > 0:
+                self.zoomUp()
+            elif event.angleDelta().y() < 0:
+                self.zoomDown()
+        else:
+            QGraphicsView.wheelEvent(self, event)
+
+    def resizeEvent(self, event):
+        QGraphicsView.resizeEvent(self, event)
+        rect = self.viewport().geometry()
+        self._header.setGeometry(QRect(rect.left() - 20, rect.top(), 20,
+                                       rect.height()))
+
+    def set_config(self, start_date, end_date, selected_items):
+        drawing = self._drawing
+        # Keep the zoom: the scene always has the same width.
+        drawing.set_scale(self.scale_factor())
+        drawing.set_dates(start_date, end_date)
+        self.setTransform(QTransform.fromScale(drawing.scale(), 1))
+        drawing._selected_items = selected_items
+        drawing._height = 20 + 80 * len(selected_items)
+        self.scene().populate()
+        self.scene().set_scale(self.scale_factor())
+        self.scroll_to_start()
+        self._header.update()
+
+    def scroll_to_start(self):
+        """Show the start date and the first row of the chart."""
+        for bar in (self.horizontalScrollBar(), self.verticalScrollBar()):
+            bar.setValue(bar.minimum())
+
+    def showEvent(self, event):
+        QGraphicsView.showEvent(self, event)
+        # The view centers the scene until its size is known.
+        if not self._shown:
+            self._shown = True
+            self.scroll_to_start()
+
+    def show_events(self, shown):
+        self._drawing._show_events = shown
+        self.scene().update()
+
+    def scroll_to_date(self, date):
+        center = self.mapToScene(self.viewport().rect().center())
+        self.centerOn(self.dateToScene(date), center.y())
+
+    def scroll_to_row(self, c):
+        center = self.mapToScene(self.viewport().rect().center())
+        self.ensureVisible(QRectF(center.x(), c * 80, 0, 80), 0, 10)
+
+    def viewportEvent(self, event):
+        if event.type() == QEvent.ToolTip:
+            pos = self.mapToScene(event.pos())
+            drawing = self.drawing()
+            hit = drawing.job_at(QPoint(
+                int(20 + self.scale_factor() * pos.x()), int(pos.y())))
+            if hit:
+                QToolTip.showText(event.globalPos(),
+                                  drawing.job_info(*hit), self)
+            else:
+                QToolTip.hideText()
+            return True
+        return QGraphicsView.viewportEvent(self, event)
+
+
+class GanttSceneWindow(GanttViewWindow):
+    def __init__(self, sim, conf, index=None):
+        GanttViewWindow.__init__(self, GanttView, sim, conf, index)
@@ -49,6 +49,10 @@ class QxtSpanSliderWidget(QWidget):
         self._spin_start.setRange(low, upp)
         self._spin_end.setRange(low, upp)
 
+    def setSuffix(self, suffix):
+        self._spin_start.setSuffix(suffix)
+        self._spin_end.setSuffix(suffix)
+
     def setSpan(self, low, upp):
         self._spin_start.setValue(low)
         self._spin_end.setValue(upp)
@@ -0,0 +1,398 @@
+"""
+Simulation run in a child process.
+
+The configuration is sent to the child as XML, the progress comes back over
+a pipe and, at the end of the run, the monitors of the model are sent back
+as plain tuples. They are replayed into a model that is built from the same
+configuration but never run, so that the Gantt chart, the results and the
+trace export work as with a model simulated in the GUI process. This module
+does not depend on Qt.
+"""
+import os
+import tempfile
+import time
+import traceback
+from xml.dom import minidom
+
+from simso.configuration import Configuration
+from simso.configuration.GenerateConfiguration import generate
+from simso.core import Model
+from simso.core.JobEvent import JobEvent
+from simso.core.ProcEvent import (ProcCxtLoadEvent, ProcCxtSaveEvent,
+                                  ProcEvent, ProcIdleEvent,
+                                  ProcOverheadEvent, ProcRunEvent)
+from simso.core.SchedulerEvent import SchedulerEvent
+from simso.core.results import Results
+
+# The simulated date is checked PROGRESS_TICKS times during a run and the
+# progress is reported at most every PROGRESS_INTERVAL seconds.
+PROGRESS_TICKS = 1000
+PROGRESS_INTERVAL = 0.2
+
+
+def configuration_xml(configuration):
+    """
+    Return the XML of configuration and the directory its relative paths
+    refer to.
+    """
+    return generate(configuration), configuration.cur_dir
+
+
+def relocate_paths(xml, cur_dir, directory):
+    """
+    Return the XML of a configuration whose relative paths, of the scheduler
+    and of the stacks, refer to cur_dir, with these paths made relative to
+    directory.
+    """
+    dom = minidom.parseString(xml)
+    for tag, name in (('sched', 'className'), ('task', 'stack')):
+        for element in dom.getElementsByTagName(tag):
+            if element.getAttribute(name):
+                element.setAttribute(name, os.path.relpath(
+                    os.path.join(cur_dir, element.getAttribute(name)),
+                    directory))
+    return dom.toxml()
+
+
+def load_configuration(xml, cur_dir):
+    """
+    Parse the XML of a configuration whose relative paths refer to cur_dir.
+    The file is written in the temporary directory for a moment, with the
+    paths of the scheduler and of the stacks relocated (see
+    relocate_paths).
+    """
+    cur_dir = cur_dir or os.curdir
+    fd, path = tempfile.mkstemp(suffix=".xml")
+    directory = os.path.dirname(path)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(relocate_paths(xml, cur_dir, directory))
+        configuration = Configuration(path)
+    finally:
+        os.remove(path)
+    configuration._set_filename(None)
+    configuration._cur_dir = cur_dir
+    for task in configuration.task_info_list:
+        if task.stack_file:
+            task.set_stack_file(os.path.join(directory, task.stack_file),
+                                cur_dir)
+    return configuration
+
+
+class ProgressReporter(object):
+    """
+    Progress callback of a model that calls report(date, events), events
+    being the number of job events simulated so far, at most every interval
+    seconds of wall clock whatever the number of callbacks.
+    """
+    def __init__(self, report, interval=PROGRESS_INTERVAL):
+        self._report = report
+        self._interval = interval
+        self._last = None
+        self._events = JobEvent.count
+
+    def attach(self, model):
+        """Make model check its date PROGRESS_TICKS times during its run."""
+        model.progress.delay = model.duration // PROGRESS_TICKS + 1
+
+    def __call__(self, date):
+        now = time.time()
+        if self._last is None or now - self._last >= self._interval:
+            self._last = now
+            self._report(date, JobEvent.count - self._events)
+
+
+def serialize_model(model):
+    """
+    Return the state of a model at the end of its run: the jobs of the tasks
+    and the monitors, with the tasks, processors and jobs replaced by their
+    position.
+    """
+    return merge_increment(None, serialize_increment(model)[0])
+
+
+def serialize_increment(model, positions=None):
+    """
+    Return the part of the state of model (see serialize_model) that
+    changed since the positions returned by a previous call, or the whole
+    state, and the new positions. An increment contains, for each task, the
+    jobs that were still active at the previous call and the new ones, as
+    (rank of the job in the task, job) pairs, and the events monitored
+    since; merge_increment adds it to the previous state.
+    """
+    cpus = dict((cpu, k) for k, cpu in enumerate(model.processors))
+    if positions is None:
+        positions = {'jobs': {},
+                     'tasks': [([], 0, 0)] * len(model.task_list),
+                     'processors': [(0, 0)] * len(model.processors),
+                     'scheduler': 0, 'logs': 0}
+    # Position of each job: its task and its rank in the jobs of the task.
+    indices = positions['jobs']
+    for t, task in enumerate(model.task_list):
+        for k in range(positions['tasks'][t][1], len(task.jobs)):
+            indices[task.jobs[k]] = (t, k)
+    new_positions = {'jobs': indices, 'tasks': [], 'processors': []}
+    data = {'now': model.now(), 'tasks': [], 'processors': []}
+    for task, (active, count, events) in zip(model.task_list,
+                                             positions['tasks']):
+        jobs = task.jobs
+        ranks = active + list(range(count, len(jobs)))
+        data['tasks'].append({
+            'jobs': [(k, (jobs[k].name, jobs[k].activation_date,
+                          jobs[k].absolute_deadline, jobs[k].start_date,
+                          jobs[k].end_date, jobs[k].aborted,
+                          jobs[k].computation_time_cycles,
+                          jobs[k].actual_computation_time_cycles))
+                     for k in ranks],
+            'monitor': [(date, indices[evt.job][1], evt.event,
+                         cpus.get(evt.cpu), evt.id_)
+                        for date, evt in task.monitor[events:]]})
+        new_positions['tasks'].append((
+            [k for k in ranks if jobs[k].end_date is None], len(jobs),
+            len(task.monitor)))
+    for cpu, (events, timers) in zip(model.processors,
+                                     positions['processors']):
+        monitor = []
+        for date, evt in cpu.monitor[events:]:
+            if evt.event == ProcEvent.RUN:
+                monitor.append((date, evt.event, indices[evt.args], None))
+            else:
+                monitor.append((date, evt.event, evt.args,
+                                getattr(evt, 'terminated', None)))
+        data['processors'].append({
+            'monitor': monitor,
+            'timer_monitor': [date for date, _ in
+                              cpu.timer_monitor[timers:]]})
+        new_positions['processors'].append((len(cpu.monitor),
+                                            len(cpu.timer_monitor)))
+    monitor = model.scheduler.monitor
+    data['scheduler'] = [(date, evt.event, cpus.get(evt.cpu))
+                         for date, evt in monitor[positions['scheduler']:]]
+    new_positions['scheduler'] = len(monitor)
+    data['logs'] = [(date, msg) for date, msg in
+                    model.logs[positions['logs']:]]
+    new_positions['logs'] = len(model.logs)
+    return data, new_positions
+
+
+def merge_increment(state, increment):
+    """
+    Add an increment returned by serialize_increment to state, None before
+    the first increment, and return the state.
+    """
+    if state is None:
+        state = {'tasks': [{'jobs': [], 'monitor': []}
+                           for _ in increment['tasks']],
+                 'processors': [{'monitor': [], 'timer_monitor': []}
+                                for _ in increment['processors']],
+                 'scheduler': [], 'logs': []}
+    state['now'] = increment['now']
+    for old, new in zip(state['tasks'], increment['tasks']):
+        jobs = old['jobs']
+        # The new jobs follow the ones already known, in order.
+        for k, job in new['jobs']:
+            if k < len(jobs):
+                jobs[k] = job
+            else:
+                jobs.append(job)
+        old['monitor'].extend(new['monitor'])
+    for old, new in zip(state['processors'], increment['processors']):
+        old['monitor'].extend(new['monitor'])
+        old['timer_monitor'].extend(new['timer_monitor'])
+    state['scheduler'].extend(increment['scheduler'])
+    state['logs'].extend(increment['logs'])
+    return state
+
+
+class ReplayJob(object):
+    """
+    Job of a model simulated in another process, with the state it had at
+    the end of the run.
+    """
+    def __init__(self, task, name, activation_date, absolute_deadline,
+                 start_date, end_date, aborted, computation_time_cycles,
+                 actual_computation_time_cycles):
+        self.name = name
+        self._task = task
+        self._sim = task.sim
+        self._activation_date = activation_date
+        self._absolute_deadline = absolute_deadline
+        self._start_date = start_date
+        self._end_date = end_date
+        self._aborted = aborted
+        self._computation_time = computation_time_cycles
+        self._actual_computation_time = actual_computation_time_cycles
+
+    def is_active(self):
+        return self._end_date is None
+
+    @property
+    def sim(self):
+        return self._sim
+
+    @property
+    def task(self):
+        return self._task
+
+    @property
+    def cpu(self):
+        return self._task.cpu
+
+    @property
+    def data(self):
+        return self._task.data
+
+    @property
+    def wcet(self):
+        return self._task.wcet
+
+    @property
+    def period(self):
+        return self._task.period
+
+    @property
+    def deadline(self):
+        return self._task.deadline
+
+    @property
+    def aborted(self):
+        return self._aborted
+
+    @property
+    def exceeded_deadline(self):
+        return (self._absolute_deadline * self._sim.cycles_per_ms <
+                self._end_date or self._aborted)
+
+    @property
+    def start_date(self):
+        return self._start_date
+
+    @property
+    def end_date(self):
+        return self._end_date
+
+    @property
+    def response_time(self):
+        if self._end_date:
+            return (float(self._end_date) / self._sim.cycles_per_ms -
+                    self._activation_date)
+        else:
+            return None
+
+    @property
+    def computation_time(self):
+        return float(self._computation_time) / self._sim.cycles_per_ms
+
+    @property
+    def computation_time_cycles(self):
+        return self._computation_time
+
+    @property
+    def actual_computation_time(self):
+        return (float(self._actual_computation_time) /
+                self._sim.cycles_per_ms)
+
+    @property
+    def actual_computation_time_cycles(self):
+        return self._actual_computation_time
+
+    @property
+    def ret(self):
+        return self.wcet - self.actual_computation_time
+
+    @property
+    def activation_date(self):
+        return self._activation_date
+
+    @property
+    def absolute_deadline(self):
+        return self._absolute_deadline
+
+    @property
+    def absolute_deadline_cycles(self):
+        return self._absolute_deadline * self._sim.cycles_per_ms
+
+
+def replay_model(configuration, data):
+    """
+    Build a model of configuration in the state described by data (see
+    serialize_model) and compute its results.
+    """
+    model = Model(configuration)
+    cpus = model.processors
+    jobs = []
+    for task, state in zip(model.task_list, data['tasks']):
+        task._jobs = [ReplayJob(task, *job) for job in state['jobs']]
+        jobs.append(task._jobs)
+        for date, k, event, cpu, id_ in state['monitor']:
+            evt = JobEvent(task._jobs[k], event,
+                           cpus[cpu] if cpu is not None else None)
+            evt.id_ = id_
+            task.monitor.observe(evt, date)
+    for cpu, state in zip(cpus, data['processors']):
+        for date, event, args, terminated in state['monitor']:
+            if event == ProcEvent.RUN:
+                evt = ProcRunEvent(jobs[args[0]][args[1]])
+            elif event == ProcEvent.IDLE:
+                evt = ProcIdleEvent()
+            elif args == "CS":
+                evt = ProcCxtSaveEvent(terminated)
+            elif args == "CL":
+                evt = ProcCxtLoadEvent(terminated)
+            else:
+                evt = ProcOverheadEvent(args)
+            cpu.monitor.observe(evt, date)
+        for date in state['timer_monitor']:
+            cpu.timer_monitor.observe(None, date)
+    for date, event, cpu in data['scheduler']:
+        evt = SchedulerEvent(cpus[cpu] if cpu is not None else None)
+        evt.event = event
+        model.scheduler.monitor.observe(evt, date)
+    for date, msg in data['logs']:
+        model.logs.observe(msg, date)
+    model._t = data['now']
+    if model.now() > 0:
+        model.results = Results(model)
+        model.results.end()
+    return model
+
+
+class Callbacks(object):
+    """Progress callback of a model that calls several callbacks."""
+    def __init__(self, *callbacks):
+        self._callbacks = callbacks
+
+    def attach(self, model):
+        for callback in self._callbacks:
+            callback.attach(model)
+
+    def __call__(self, date):
+        for callback in self._callbacks:
+            callback(date)
+
+
+def simulate(connection, xml, cur_dir, checkpoint=None):
+    """
+    Entry point of the child process: simulate the configuration and send
+    ("progress", (date, events)) messages, then ("done", state) or
+    ("error", traceback) on connection. If checkpoint is given, it is the
+    (filename, every_ms, every_seconds) of a CheckpointWriter.
+    """
+    # Imported here, Checkpoint depends on this module.
+    from .Checkpoint import CheckpointWriter
+    try:
+        configuration = load_configuration(xml, cur_dir)
+        callback = progress = ProgressReporter(
+            lambda date, events: connection.send(("progress",
+                                                  (date, events))))
+        if checkpoint:
+            callback = Callbacks(progress, CheckpointWriter(
+                checkpoint[0], xml, *checkpoint[1:]))
+        model = Model(configuration, callback=callback)
+        callback.attach(model)
+        model.run_model()
+        connection.send(("done", serialize_model(model)))
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
@@ -1,20 +1,59 @@
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QSettings, QStandardPaths, QThread, pyqtSignal
 from PyQt5.QtWidgets import QMdiArea, QMessageBox, QProgressDialog
 
+import multiprocessing
 import os.path
 import sys
+import time
 import traceback
 
 from simso.core import Model
 
 from .Gantt import create_gantt_window
+from .GanttCompare import GanttCompare
+from .Checkpoint import CheckpointWriter, checkpoint_file, read_checkpoint
+from .GanttIndex import GanttIndex
+from .SimulationProcess import (Callbacks, ProgressReporter,
+                                configuration_xml, replay_model, simulate)
+from .SweepWindow import SweepWindow
+from .TraceExport import export_trace
 from .ModelWindow import ModelWindow
 from .results import ResultsWindow
 from .Configuration import Configuration
 
+
+def format_duration(seconds):
+    """Return a duration in seconds as h:mm:ss or m:ss."""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "%d:%02d:%02d" % (hours, minutes, seconds)
+    return "%d:%02d" % (minutes, seconds)
+
+
+def checkpoint_directory():
+    """
+    Return the directory of the checkpoints of the configurations that are
+    not saved, private to the user.
+    """
+    return os.path.join(QStandardPaths.writableLocation(
+        QStandardPaths.AppLocalDataLocation), "checkpoints")
+
+
+def checkpoint_settings():
+    """
+    Return the simulated ms and the wall-clock seconds between two
+    checkpoints of a run (0 to not use the condition).
+    """
+    settings = QSettings()
+    return (float(settings.value("checkpointSimulatedMs", 0)),
+            float(settings.value("checkpointSeconds", 0)))
+
+
 class RunSimulation(QThread):
 
-    updateProgressBar = pyqtSignal(int)
+    # Simulated date (cycles) and number of job events simulated.
+    updateProgressBar = pyqtSignal(float, float)
 
     class Console(object):
 
@@ -28,6 +67,7 @@ class RunSimulation(QThread):
         QThread.__init__(self, parent)
         self._finished = False
         self._error = False
+        self.gantt_index = None
         self._console = RunSimulation.Console()
 
     @property
@@ -40,12 +80,18 @@ class RunSimulation(QThread):
     def set_model(self, model):
         self._model = model
 
-    def updateProgress(self, value):
-        self.updateProgressBar.emit(value)
+    def updateProgress(self, date, events):
+        self.updateProgressBar.emit(date, events)
 
     def run(self):
         try:
             self._model.run_model()
+            # Summarize the run for the overview of the Gantt chart while
+            # still in the worker thread.
+            self.gantt_index = GanttIndex(self._model)
+            self.gantt_index.overview()
+            self.gantt_index.missed_tasks()
+            self.gantt_index.events()
         except:
             self._error = True
             traceback.print_exc(file=self._console)
@@ -53,6 +99,94 @@ class RunSimulation(QThread):
         self._finished = True
 
 
+class RunSimulationProcess(QThread):
+    """
+    Simulation run in a child process (see SimulationProcess). The thread
+    only waits for the messages of the child and rebuilds the model at the
+    end, so that the GUI stays responsive, and aborting kills the child.
+    """
+
+    updateProgressBar = pyqtSignal(float, float)
+
+    def __init__(self, configuration, checkpoint=None, parent=None):
+        QThread.__init__(self, parent)
+        self._configuration = configuration
+        self._checkpoint = checkpoint
+        self._error = None
+        self._process = None
+        self.model = None
+        self.gantt_index = None
+
+    @property
+    def error(self):
+        return self._error is not None
+
+    def get_error(self):
+        return [self._error]
+
+    def start(self):
+        # The child does not inherit the threads of the GUI.
+        context = multiprocessing.get_context("spawn")
+        self._connection, child = context.Pipe(duplex=False)
+        xml, cur_dir = configuration_xml(self._configuration)
+        self._process = context.Process(
+            target=simulate, args=(child, xml, cur_dir, self._checkpoint))
+        self._process.daemon = True
+        self._process.start()
+        child.close()
+        QThread.start(self)
+
+    def kill(self):
+        if self._process and self._process.is_alive():
+            self._process.kill()
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    kind, value = self._connection.recv()
+                except EOFError:
+                    break
+                if kind == "progress":
+                    self.updateProgressBar.emit(*value)
+                elif kind == "error":
+                    self._error = value
+                elif kind == "done":
+                    self.model = replay_model(self._configuration, value)
+                    self.gantt_index = GanttIndex(self.model)
+                    self.gantt_index.overview()
+                    self.gantt_index.missed_tasks()
+                    self.gantt_index.events()
+        except:
+            self._error = traceback.format_exc()
+            traceback.print_exc(file=sys.stderr)
+        finally:
+            self._connection.close()
+            self._process.join()
+        # A negative exit code means that the child was killed by abort.
+        if (self.model is None and self._error is None and
+                self._process.exitcode > 0):
+            self._error = ("The simulation process exited with code %d." %
+                           self._process.exitcode)
+
+
+class ExportTrace(QThread):
+    """Export of the trace of a simulated model (see TraceExport)."""
+
+    def __init__(self, model, filename, parent=None):
+        QThread.__init__(self, parent)
+        self._model = model
+        self._filename = filename
+        self.error = None
+
+    def run(self):
+        try:
+            export_trace(self._model, self._filename)
+        except Exception as msg:
+            self.error = str(msg)
+            traceback.print_exc(file=sys.stderr)
+
+
 class SimulationTab(QMdiArea):
     def __init__(self, simulation_window, simulation_file=None, parent=None):
         QMdiArea.__init__(self, parent)
@@ -65,11 +199,18 @@ class SimulationTab(QMdiArea):
         self.worker = None
         self._model = None
         self._gantt = None
+        self._gantt_index = None
+        self._compare = None
         self._logs = None
         self._editor = None
         self._metrics_window = None
         self._model_window = None
+        self._sweep_window = None
+        self._export = None
         self._progress_bar = None
+        self._progress_start = None
+        self._checkpoint = None
+        self._aborted = False
         self._documentation = None
         self._simulation_window = simulation_window
 
@@ -103,12 +244,25 @@ class SimulationTab(QMdiArea):
 
     def showGantt(self):
         if not self._gantt and self._model:
-            self._gantt = create_gantt_window(self._model)
+            self._gantt = create_gantt_window(self._model, self._gantt_index)
             if self._gantt:
                 self.addSubWindow(self._gantt)
         if self._gantt:
             self._gantt.parent().show()
 
+    def compareGantt(self, other, names):
+        """
+        Show the Gantt charts of this simulation and of the one of the tab
+        other on the same time axis.
+        """
+        if self._compare:
+            self.delete_window(self._compare)
+        self._compare = GanttCompare(
+            (self._model, other._model), names,
+            (self._gantt_index, other._gantt_index))
+        self.addSubWindow(self._compare)
+        self._compare.parent().show()
+
     def showModelWindow(self):
         if not self._model_window and self._configuration:
             self._model_window = ModelWindow(self._configuration, self)
@@ -116,6 +270,12 @@ class SimulationTab(QMdiArea):
         if self._model_window:
             self._model_window.parent().show()
 
+    def showSweep(self):
+        if not self._sweep_window:
+            self._sweep_window = SweepWindow(self._configuration)
+            self.addSubWindow(self._sweep_window)
+        self._sweep_window.parent().show()
+
     def showResults(self):
         if not self._metrics_window and self._model and self._model.results:
             self._metrics_window = ResultsWindow(self._model.results)
@@ -123,19 +283,52 @@ class SimulationTab(QMdiArea):
         if self._metrics_window:
             self._metrics_window.parent().show()
 
+    def export_trace(self, filename):
+        if self._export:
+            return
+        self._export_dialog = QProgressDialog(
+            "Exporting the trace...", None, 0, 0, self)
+        self._export_dialog.setWindowModality(Qt.WindowModal)
+        self._export_dialog.show()
+        self._export = ExportTrace(self._model, filename)
+        self._export.finished.connect(self.exportFinished)
+        self._export.start()
+
+    def exportFinished(self):
+        self._export_dialog.hide()
+        self._export_dialog = None
+        error = self._export.error
+        self._export = None
+        if error:
+            QMessageBox.warning(self, "Could not export the trace", error)
+
     def _reinit_simu(self):
         self._model = None
         if self._gantt:
-            self.removeSubWindow(self._gantt.parent())
+            self.delete_window(self._gantt)
+        if self._compare:
+            self.delete_window(self._compare)
         if self._logs:
             self.removeSubWindow(self._logs.parent())
         if self._metrics_window:
             self.removeSubWindow(self._metrics_window.parent())
 
         self._gantt = None
+        self._gantt_index = None
+        self._compare = None
         self._logs = None
         self._metrics_window = None
 
+    def delete_window(self, window):
+        """
+        Remove the subwindow of window and delete both, which stops the
+        workers of the Gantt charts.
+        """
+        subwindow = window.parent()
+        self.removeSubWindow(subwindow)
+        window.deleteLater()
+        subwindow.deleteLater()
+
     def save(self):
         self._configuration.save()
 
@@ -154,10 +347,31 @@ class SimulationTab(QMdiArea):
                 self._progress_bar.canceled.connect(self.abort)
                 self._progress_bar.show()
 
-                self.worker = RunSimulation()
-                self._model = Model(self._configuration,
-                                    callback=self.worker.updateProgress)
-                self.worker.set_model(self._model)
+                xml = configuration_xml(self._configuration)[0]
+                every_ms, every_seconds = checkpoint_settings()
+                checkpoint = None
+                if every_ms or every_seconds:
+                    checkpoint = (checkpoint_file(self._configuration, xml,
+                                                  checkpoint_directory()),
+                                  every_ms, every_seconds)
+                self._checkpoint = checkpoint
+                self._aborted = False
+
+                if QSettings().value("simulationMode", "process") == \
+                        "process":
+                    self.worker = RunSimulationProcess(self._configuration,
+                                                       checkpoint)
+                else:
+                    self.worker = RunSimulation()
+                    callback = ProgressReporter(self.worker.updateProgress)
+                    if checkpoint:
+                        callback = Callbacks(callback, CheckpointWriter(
+                            checkpoint[0], xml, *checkpoint[1:]))
+                    self._model = Model(self._configuration,
+                                        callback=callback)
+                    callback.attach(self._model)
+                    self.worker.set_model(self._model)
+                self._progress_start = None
 
                 self.worker.finished.connect(self.runFinished)
                 self.worker.start()
@@ -170,6 +384,12 @@ class SimulationTab(QMdiArea):
 
     def abort(self):
         self._progress_bar = None
+        # The checkpoints are kept to show the results of the run so far.
+        self._aborted = True
+        if isinstance(self.worker, RunSimulationProcess):
+            # Nothing is left running, the results of the run are lost.
+            self.worker.kill()
+            return
         self._model.stopSimulation()
         self._simulation_window.updateMenus()
         # Ultimate killer.
@@ -178,6 +398,15 @@ class SimulationTab(QMdiArea):
     def runFinished(self):
         if self._progress_bar:
             self._progress_bar.hide()
+        if isinstance(self.worker, RunSimulationProcess):
+            self._model = self.worker.model
+        if self._model:
+            self._gantt_index = ((self.worker and self.worker.gantt_index) or
+                                 GanttIndex(self._model))
+        if (self._checkpoint and self._model and not self._aborted and
+                not (self.worker and self.worker.error) and
+                os.path.exists(self._checkpoint[0])):
+            os.remove(self._checkpoint[0])
         self._simulation_window.updateMenus()
         self.showResults()
         if self.worker and self.worker.error:
@@ -186,11 +415,66 @@ class SimulationTab(QMdiArea):
                                  QMessageBox.Ok | QMessageBox.Default,
                                  QMessageBox.NoButton)
 
-    def updateProgressBar(self, value):
-        if self._progress_bar:
-            duration = self._configuration.duration
-            p = 100.0 * value / duration
-            self._progress_bar.setValue(int(p))
+    def showPartialResults(self):
+        """
+        Show the results of a run that was aborted or that crashed, up to its
+        last checkpoint.
+        """
+        xml = configuration_xml(self._configuration)[0]
+        filename = checkpoint_file(self._configuration, xml,
+                                   checkpoint_directory())
+        if not os.path.exists(filename):
+            QMessageBox.information(
+                self, "Partial results",
+                "There is no checkpoint of this simulation.")
+            return
+        try:
+            state = read_checkpoint(filename, xml)
+            if state is not None:
+                model = replay_model(self._configuration, state)
+        except Exception as msg:
+            QMessageBox.warning(self, "Partial results",
+                                "The checkpoint could not be read: %s" % msg)
+            return
+        if state is None:
+            QMessageBox.information(
+                self, "Partial results",
+                "The simulation was stopped before its first checkpoint.")
+            return
+        self._reinit_simu()
+        self._model = model
+        self._gantt_index = GanttIndex(self._model)
+        self._simulation_window.updateMenus()
+        self.showResults()
+        QMessageBox.information(
+            self, "Partial results",
+            "The results are shown up to the last checkpoint, at %g ms out "
+            "of %g ms. Run the simulation again to get the complete "
+            "results." % (self._model.now_ms(),
+                          self._configuration.duration_ms))
+
+    def updateProgressBar(self, date, events):
+        if not self._progress_bar:
+            return
+        duration = self._configuration.duration
+        self._progress_bar.setValue(int(100.0 * date / duration))
+        # The throughput is measured from the first report, once the
+        # simulation is started.
+        now = time.time()
+        if self._progress_start is None:
+            self._progress_start = (now, date, events)
+            return
+        start, start_date, start_events = self._progress_start
+        elapsed = now - start
+        if elapsed <= 0 or date <= start_date:
+            return
+        speed = (date - start_date) / elapsed
+        self._progress_bar.setLabelText(
+            "Simulating...\n%d events/s, %.1f simulated ms/s\n"
+            "Remaining: %s" % (
+                (events - start_events) / elapsed,
+                speed / self._configuration.cycles_per_ms,
+                format_duration((duration - date) / speed)))
 
     def close(self):
         if not self._configuration.is_saved():
@@ -201,4 +485,7 @@ class SimulationTab(QMdiArea):
                 QMessageBox.Ok | QMessageBox.Cancel, QMessageBox.Cancel)
             if ret == QMessageBox.Cancel:
                 return False
+        for window in (self._gantt, self._compare):
+            if window:
+                window.shutdown()
         return True
@@ -6,7 +6,7 @@ try:
 except ImportError:
     from PyQt5.QtWebKitWidgets import QWebView
 from PyQt5.QtCore import Qt, QUrl, QSettings, QFileInfo
-from PyQt5.QtWidgets import QAction, QApplication, QDockWidget, QFileDialog, QMainWindow, QMenu, QMessageBox, QStyle, QTabWidget, QToolBar
+from PyQt5.QtWidgets import QAction, QActionGroup, QApplication, QDockWidget, QFileDialog, QInputDialog, QMainWindow, QMenu, QMessageBox, QStyle, QTabWidget, QToolBar
 
 import os.path
 import simso
@@ -54,6 +54,15 @@ class SimulatorWindow(QMainWindow):
         self._runAction.setShortcut(Qt.CTRL + Qt.Key_R)
         self._runAction.triggered.connect(self.fileRun)
 
+        # Parameter sweep
+        self._sweepAction = QAction('Parameter s&weep...', None)
+        self._sweepAction.triggered.connect(self.fileSweep)
+
+        # Export trace
+        self._exportTraceAction = QAction('&Export trace...', None)
+        self._exportTraceAction.setEnabled(False)
+        self._exportTraceAction.triggered.connect(self.fileExportTrace)
+
         # Show Model data
         self._modelAction = QAction('&Model data', None)
         self._modelAction.setShortcut(Qt.CTRL + Qt.Key_M)
@@ -74,6 +83,40 @@ class SimulatorWindow(QMainWindow):
         #self._metricsAction.setCheckable(True)
         self._metricsAction.triggered.connect(self.showResults)
 
+        # Compare Gantt
+        self._compareAction = QAction('&Compare Gantt...', None)
+        self._compareAction.setEnabled(False)
+        self._compareAction.triggered.connect(self.compareGantt)
+
+        # Gantt backend
+        self._ganttBackendActions = QActionGroup(self)
+        backend = QSettings().value("ganttBackend", "tiles")
+        for name, label in (("tiles", "&Tiles"),
+                            ("scene", "&Graphics view"),
+                            ("opengl", "&OpenGL")):
+            act = QAction(label, self._ganttBackendActions)
+            act.setCheckable(True)
+            act.setChecked(name == backend)
+            act.setData(name)
+        self._ganttBackendActions.triggered.connect(self.setGanttBackend)
+
+        # Simulation mode
+        self._simulationModeActions = QActionGroup(self)
+        mode = QSettings().value("simulationMode", "process")
+        for name, label in (("process", "In a &worker process"),
+                            ("thread", "In a &thread")):
+            act = QAction(label, self._simulationModeActions)
+            act.setCheckable(True)
+            act.setChecked(name == mode)
+            act.setData(name)
+        self._simulationModeActions.triggered.connect(self.setSimulationMode)
+
+        # Checkpoints
+        self._checkpointsAction = QAction('&Checkpoints...', None)
+        self._checkpointsAction.triggered.connect(self.setCheckpoints)
+        self._partialAction = QAction('&Partial results from checkpoint', None)
+        self._partialAction.triggered.connect(self.filePartialResults)
+
         # Show Doc
         self._docAction = QAction('&Documentation', None)
         self._docAction.triggered.connect(self.showDocumentation)
@@ -96,6 +139,13 @@ class SimulatorWindow(QMainWindow):
         file_menu.addAction(self._saveAction)
         file_menu.addAction(self._saveAsAction)
         file_menu.addAction(self._runAction)
+        file_menu.addAction(self._sweepAction)
+        file_menu.addAction(self._partialAction)
+        file_menu.addAction(self._exportTraceAction)
+        mode_menu = file_menu.addMenu('Run &simulations')
+        mode_menu.addActions(self._simulationModeActions.actions())
+        mode_menu.addSeparator()
+        mode_menu.addAction(self._checkpointsAction)
         file_menu.addSeparator()
         for act in self._recentFileActions:
             file_menu.addAction(act)
@@ -107,7 +157,10 @@ class SimulatorWindow(QMainWindow):
         view_menu = QMenu('&View', self)
         view_menu.addAction(self._modelAction)
         view_menu.addAction(self._ganttAction)
+        view_menu.addAction(self._compareAction)
         view_menu.addAction(self._metricsAction)
+        gantt_menu = view_menu.addMenu('Gantt &backend')
+        gantt_menu.addActions(self._ganttBackendActions.actions())
 
         # Help Menu:
         help_menu = QMenu('&Help', self)
@@ -209,6 +262,47 @@ class SimulatorWindow(QMainWindow):
     def showGantt(self):
         self.main_tab.currentWidget().showGantt()
 
+    def compareGantt(self):
+        current = self.main_tab.currentWidget()
+        others = [(self.main_tab.tabText(i), self.main_tab.widget(i))
+                  for i in range(self.main_tab.count())
+                  if self.main_tab.widget(i) is not current and
+                  self.main_tab.widget(i)._model is not None]
+        if not others:
+            QMessageBox.information(
+                self, "Compare Gantt", "Run a simulation in another tab to "
+                "compare it with this one.")
+            return
+        labels = ["%d: %s" % (k + 1, name)
+                  for k, (name, _) in enumerate(others)]
+        label, ok = QInputDialog.getItem(
+            self, "Compare Gantt", "Compare with:", labels, 0, False)
+        if ok:
+            name, tab = others[labels.index(label)]
+            current.compareGantt(tab, (self.main_tab.tabText(
+                self.main_tab.indexOf(current)), name))
+
+    def setGanttBackend(self, action):
+        QSettings().setValue("ganttBackend", action.data())
+
+    def setSimulationMode(self, action):
+        QSettings().setValue("simulationMode", action.data())
+
+    def setCheckpoints(self):
+        settings = QSettings()
+        every_ms, ok = QInputDialog.getDouble(
+            self, "Checkpoints", "Checkpoint every (simulated ms, 0 = never):",
+            float(settings.value("checkpointSimulatedMs", 0)), 0, 1e9, 1)
+        if not ok:
+            return
+        every_seconds, ok = QInputDialog.getDouble(
+            self, "Checkpoints", "Checkpoint every (seconds, 0 = never):",
+            float(settings.value("checkpointSeconds", 0)), 0, 1e6, 1)
+        if not ok:
+            return
+        settings.setValue("checkpointSimulatedMs", every_ms)
+        settings.setValue("checkpointSeconds", every_seconds)
+
     def showModelWindow(self):
         self.main_tab.currentWidget().showModelWindow()
 
@@ -273,6 +367,24 @@ class SimulatorWindow(QMainWindow):
         self._runAction.setEnabled(False)
         self.main_tab.currentWidget().run()
 
+    def fileSweep(self):
+        self.main_tab.currentWidget().showSweep()
+
+    def filePartialResults(self):
+        self.main_tab.currentWidget().showPartialResults()
+
+    def fileExportTrace(self):
+        filters = [("Trace events (*.json)", ".json"),
+                   ("Value Change Dump (*.vcd)", ".vcd")]
+        trace_file, selected = QFileDialog.getSaveFileName(
+            filter=";;".join(name for name, _ in filters),
+            caption="Export the trace of the simulation.")
+        if trace_file:
+            if not trace_file.lower().endswith(
+                    tuple(ext for _, ext in filters)):
+                trace_file += dict(filters)[selected]
+            self.main_tab.currentWidget().export_trace(trace_file)
+
     def fileQuit(self):
         self.close()
 
@@ -299,11 +411,19 @@ class SimulatorWindow(QMainWindow):
         if self.main_tab.count() > 0:
             widget = self.main_tab.currentWidget()
             self._runAction.setEnabled(True)
+            self._sweepAction.setEnabled(True)
+            self._partialAction.setEnabled(True)
             self._modelAction.setEnabled(True)
             self._ganttAction.setEnabled(widget._model is not None)
+            self._compareAction.setEnabled(widget._model is not None)
             self._metricsAction.setEnabled(widget._model is not None)
+            self._exportTraceAction.setEnabled(widget._model is not None)
         else:
             self._runAction.setEnabled(False)
+            self._sweepAction.setEnabled(False)
+            self._partialAction.setEnabled(False)
             self._modelAction.setEnabled(False)
             self._ganttAction.setEnabled(False)
+            self._compareAction.setEnabled(False)
             self._metricsAction.setEnabled(False)
+            self._exportTraceAction.setEnabled(False)
@@ -0,0 +1,219 @@
+"""
+Parameter sweeps.
+
+A sweep simulates the configurations derived from a base configuration by
+every combination of the values of its axes (total utilization, number of
+tasks, scheduler, number of processors, context switch overhead in cycles),
+with several random task sets per combination when the tasks are generated.
+The runs are spread over a pool of worker processes and each one is reduced
+to a few metrics. This module does not depend on Qt.
+"""
+import concurrent.futures
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import traceback
+import zlib
+
+import numpy
+
+from simso.configuration import Configuration
+from simso.core import Model
+from simso.generator.task_generator import (StaffordRandFixedSum,
+                                            gen_periods_loguniform,
+                                            gen_tasksets)
+
+from .SimulationProcess import configuration_xml, load_configuration
+
+# Name and type of the values of the axes, in the order of the columns.
+AXES = [("utilization", float), ("tasks", int), ("scheduler", str),
+        ("processors", int), ("overhead", int)]
+
+METRICS = ["jobs", "misses", "miss_ratio", "preemptions", "migrations",
+           "load"]
+
+
+def derive_configuration(configuration, point, periods=(10, 100), seed=0):
+    """
+    Change configuration according to the values of the axes of point. A
+    new task set is generated if the utilization or the number of tasks is
+    given; it only depends on seed, on these two values and on the number of
+    the task set, so that all the schedulers are compared on the same sets.
+    """
+    if "scheduler" in point:
+        scheduler = point["scheduler"]
+        if scheduler.endswith(".py"):
+            configuration.scheduler_info.clas = ''
+            configuration.scheduler_info.filename = os.path.join(
+                configuration.cur_dir, scheduler)
+        else:
+            configuration.scheduler_info.clas = scheduler
+
+    processors = configuration.proc_info_list
+    if "processors" in point:
+        n = point["processors"]
+        model = processors[0]
+        del processors[n:]
+        for k in range(len(processors), n):
+            configuration.add_processor(
+                "CPU %d" % (k + 1), k + 1, model.cs_overhead,
+                model.cl_overhead, model.migration_overhead, model.speed)
+    if "overhead" in point:
+        for proc in processors:
+            proc.cs_overhead = proc.cl_overhead = point["overhead"]
+
+    if "utilization" in point or "tasks" in point:
+        tasks = configuration.task_info_list
+        n = point.get("tasks", len(tasks))
+        u = point.get("utilization",
+                      sum(task.wcet / task.period for task in tasks))
+        state = zlib.crc32(repr((seed, point.get("set", 0), u, n)).encode())
+        random.seed(state)
+        numpy.random.seed(state)
+        utilizations = StaffordRandFixedSum(n, u, 1)
+        if utilizations is None:
+            raise ValueError("Cannot generate %d tasks with a total "
+                             "utilization of %g." % (n, u))
+        taskset = gen_tasksets(utilizations,
+                               gen_periods_loguniform(n, 1, *periods))[0]
+        del tasks[:]
+        for i, task in enumerate(taskset):
+            ci, pi = task[0], task[1]
+            configuration.add_task("Task " + str(i + 1), i + 1, period=pi,
+                                   wcet=ci, deadline=pi)
+    return configuration
+
+
+def summarize(model):
+    """Return the metrics of a simulated model."""
+    results = model.results
+    jobs = sum(len(task.jobs) for task in results.tasks.values())
+    misses = results.total_exceeded_count
+    loads = [load for _, load, _ in results.calc_load()]
+    return {"jobs": jobs,
+            "misses": misses,
+            "miss_ratio": float(misses) / jobs if jobs else 0.0,
+            "preemptions": results.total_preemptions,
+            "migrations": results.total_migrations,
+            "load": sum(loads) / len(loads) if loads else 0.0}
+
+
+def run_point(xml, cur_dir, point, periods, seed):
+    """
+    Simulate the configuration of point (see derive_configuration) and
+    return its metrics, or {"error": message} if it failed.
+    """
+    return run_configuration(load_configuration, (xml, cur_dir), point,
+                             periods, seed)
+
+
+def run_file_point(filename, point, periods, seed):
+    """Same as run_point for the configuration saved in filename."""
+    return run_configuration(Configuration, (filename,), point, periods,
+                             seed)
+
+
+def run_configuration(load, args, point, periods, seed):
+    """
+    Simulate the configuration returned by load(*args), in the worker, for
+    point and return its metrics (see run_point).
+    """
+    try:
+        configuration = derive_configuration(load(*args), point, periods,
+                                             seed)
+        configuration.check_all()
+        model = Model(configuration)
+        # The schedulers and the tasks may print on each event.
+        with open(os.devnull, 'w') as devnull:
+            stdout = os.dup(1)
+            os.dup2(devnull.fileno(), 1)
+            try:
+                model.run_model()
+            finally:
+                os.dup2(stdout, 1)
+                os.close(stdout)
+        return summarize(model)
+    except Exception:
+        return {"error": traceback.format_exc().strip().splitlines()[-1]}
+
+
+class Sweep(object):
+    """
+    Sweep of the values of axes, a list of (name, values) with the names of
+    AXES, over the base configuration. When tasks are generated, there are
+    task_sets random sets per combination, with log-uniform periods between
+    the given bounds (in ms).
+    """
+    def __init__(self, configuration, axes, task_sets=1, periods=(10, 100),
+                 seed=0):
+        self.xml, self.cur_dir = configuration_xml(configuration)
+        names = [name for name, _ in AXES]
+        self.axes = sorted([(name, list(values)) for name, values in axes
+                            if values], key=lambda axis: names.index(axis[0]))
+        self.periods = tuple(periods)
+        self.seed = seed
+        generated = any(name in ("utilization", "tasks")
+                        for name, _ in self.axes)
+        self.task_sets = task_sets if generated else 1
+
+    def columns(self):
+        columns = [name for name, _ in self.axes]
+        if self.task_sets > 1:
+            columns.append("set")
+        return columns + METRICS
+
+    def points(self):
+        """Return the values of the axes of each run, as dictionaries."""
+        names = [name for name, _ in self.axes]
+        points = []
+        for values in itertools.product(*[v for _, v in self.axes]):
+            for k in range(self.task_sets):
+                point = dict(zip(names, values))
+                if self.task_sets > 1:
+                    point["set"] = k
+                points.append(point)
+        return points
+
+    def run(self, jobs=None):
+        """
+        Simulate the points on jobs processes (one per core by default) and
+        yield (index of the point, metrics) as the runs finish. The runs not
+        started yet are cancelled if the generator is closed.
+        """
+        return run_pool(run_point, [(self.xml, self.cur_dir, point,
+                                     self.periods, self.seed)
+                                    for point in self.points()], jobs)
+
+
+def run_pool(function, calls, jobs=None):
+    """
+    Call function with each tuple of arguments of calls on jobs processes
+    (one per core by default) and yield (index of the call, result) as the
+    calls return. The calls not started yet are cancelled if the generator
+    is closed.
+    """
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = dict((executor.submit(function, *args), k)
+                       for k, args in enumerate(calls))
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def write_csv(filename, columns, rows):
+    """
+    Write the rows, dictionaries of the points with their metrics, in the
+    CSV file filename.
+    """
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns + ["error"], restval='',
+                                extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
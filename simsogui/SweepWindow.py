@@ -0,0 +1,189 @@
+import os
+
+from PyQt5.QtCore import QRegExp, QThread, pyqtSignal
+from PyQt5.QtGui import QRegExpValidator
+from PyQt5.QtWidgets import (QAbstractItemView, QDoubleSpinBox, QFileDialog,
+                             QGridLayout, QHBoxLayout, QLabel, QLineEdit,
+                             QMessageBox, QProgressBar, QPushButton, QSpinBox,
+                             QTableWidgetItem, QVBoxLayout, QWidget)
+
+from .QCopyTableWidget import QCopyTableWidget
+from .Sweep import AXES, Sweep, write_csv
+
+AXIS_LABELS = {"utilization": "Total utilizations:",
+               "tasks": "Numbers of tasks:",
+               "scheduler": "Schedulers:",
+               "processors": "Numbers of processors:",
+               "overhead": "Context switch overheads (cycles):"}
+
+AXIS_PATTERNS = {float: "^\\d*(\\.\\d*)?( \\d*(\\.\\d*)?)*$",
+                 int: "^\\d*( \\d*)*$"}
+
+
+class RunSweep(QThread):
+    """Run a sweep and emit the metrics of each point as it is simulated."""
+
+    pointDone = pyqtSignal(int, object)
+
+    def __init__(self, sweep, jobs, parent=None):
+        QThread.__init__(self, parent)
+        self._sweep = sweep
+        self._jobs = jobs
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        runs = self._sweep.run(self._jobs)
+        for k, metrics in runs:
+            self.pointDone.emit(k, metrics)
+            if self._cancelled:
+                break
+        runs.close()
+
+
+class SweepWindow(QWidget):
+    """
+    Simulation of the configuration of a tab for every combination of the
+    values of the axes (space separated, an empty axis is not swept), on all
+    the cores.
+    """
+    def __init__(self, configuration, parent=None):
+        QWidget.__init__(self, parent)
+        self.setWindowTitle("Parameter sweep")
+        self._configuration = configuration
+        self._worker = None
+        self._sweep = None
+        self._points = []
+        self._rows = []
+        layout = QVBoxLayout(self)
+
+        grid = QGridLayout()
+        self._axes = {}
+        for i, (name, kind) in enumerate(AXES):
+            edit = QLineEdit(self)
+            if kind in AXIS_PATTERNS:
+                edit.setValidator(QRegExpValidator(
+                    QRegExp(AXIS_PATTERNS[kind])))
+            grid.addWidget(QLabel(AXIS_LABELS[name], self), i, 0)
+            grid.addWidget(edit, i, 1)
+            self._axes[name] = edit
+        self._axes["scheduler"].setPlaceholderText(
+            "e.g. simso.schedulers.EDF simso.schedulers.RM")
+        layout.addLayout(grid)
+
+        hbox = QHBoxLayout()
+        hbox.addWidget(QLabel("Task sets per point:", self))
+        self._task_sets = QSpinBox(self)
+        self._task_sets.setRange(1, 10000)
+        self._task_sets.setValue(10)
+        hbox.addWidget(self._task_sets)
+        hbox.addWidget(QLabel("Periods (ms):", self))
+        self._periods = []
+        for value in (10, 100):
+            spin = QDoubleSpinBox(self)
+            spin.setRange(0.1, 100000)
+            spin.setValue(value)
+            hbox.addWidget(spin)
+            self._periods.append(spin)
+        hbox.addWidget(QLabel("Processes:", self))
+        self._jobs = QSpinBox(self)
+        self._jobs.setRange(1, 1024)
+        self._jobs.setValue(os.cpu_count() or 1)
+        hbox.addWidget(self._jobs)
+        hbox.addStretch(1)
+        layout.addLayout(hbox)
+
+        hbox = QHBoxLayout()
+        self._run_button = QPushButton("Run", self)
+        self._run_button.clicked.connect(self.run)
+        hbox.addWidget(self._run_button)
+        self._cancel_button = QPushButton("Cancel", self)
+        self._cancel_button.setEnabled(False)
+        self._cancel_button.clicked.connect(self.cancel)
+        hbox.addWidget(self._cancel_button)
+        self._save_button = QPushButton("Save CSV...", self)
+        self._save_button.setEnabled(False)
+        self._save_button.clicked.connect(self.save)
+        hbox.addWidget(self._save_button)
+        self._progress_bar = QProgressBar(self)
+        hbox.addWidget(self._progress_bar)
+        layout.addLayout(hbox)
+
+        self._table = QCopyTableWidget(0, 0, self)
+        self._table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self._table)
+
+    def axes(self):
+        return [(name, [kind(x) for x in
+                        str(self._axes[name].text()).split()])
+                for name, kind in AXES]
+
+    def run(self):
+        try:
+            self._configuration.check_all()
+            sweep = Sweep(self._configuration, self.axes(),
+                          self._task_sets.value(),
+                          [spin.value() for spin in self._periods])
+        except Exception as msg:
+            QMessageBox.warning(self, "Configuration error", str(msg))
+            return
+        self._sweep = sweep
+        self._points = sweep.points()
+        self._rows = [None] * len(self._points)
+        columns = sweep.columns()
+        self._table.clear()
+        self._table.setColumnCount(len(columns) + 1)
+        self._table.setHorizontalHeaderLabels(columns + ["error"])
+        self._table.setRowCount(len(self._points))
+        for row, point in enumerate(self._points):
+            for col, name in enumerate(columns):
+                if name in point:
+                    self._table.setItem(row, col,
+                                        QTableWidgetItem(str(point[name])))
+        self._progress_bar.setRange(0, len(self._points))
+        self._progress_bar.setValue(0)
+
+        self._worker = RunSweep(sweep, self._jobs.value(), self)
+        self._worker.pointDone.connect(self.pointDone)
+        self._worker.finished.connect(self.sweepFinished)
+        self._run_button.setEnabled(False)
+        self._cancel_button.setEnabled(True)
+        self._save_button.setEnabled(False)
+        self._worker.start()
+
+    def pointDone(self, k, metrics):
+        self._rows[k] = dict(self._points[k], **metrics)
+        columns = self._sweep.columns() + ["error"]
+        for col, name in enumerate(columns):
+            value = metrics.get(name)
+            if isinstance(value, float):
+                value = "%.4f" % value
+            if value is not None:
+                self._table.setItem(k, col, QTableWidgetItem(str(value)))
+        self._progress_bar.setValue(self._progress_bar.value() + 1)
+
+    def cancel(self):
+        if self._worker:
+            self._worker.cancel()
+            self._cancel_button.setEnabled(False)
+
+    def sweepFinished(self):
+        self._worker = None
+        self._run_button.setEnabled(True)
+        self._cancel_button.setEnabled(False)
+        self._save_button.setEnabled(any(self._rows))
+
+    def save(self):
+        csv_file = QFileDialog.getSaveFileName(
+            filter="*.csv", caption="Save the results of the sweep.")[0]
+        if csv_file:
+            if not csv_file.lower().endswith('.csv'):
+                csv_file += '.csv'
+            write_csv(csv_file, self._sweep.columns(),
+                      [row for row in self._rows if row])
+
+    def closeEvent(self, event):
+        self.parent().hide()
+        event.ignore()
@@ -0,0 +1,288 @@
+"""
+Export of the monitors of a simulation to formats read by external trace
+viewers.
+
+The supported formats are the trace-event JSON format (Chrome tracing,
+Perfetto) and the Value Change Dump format of waveform viewers. The events
+are generated one by one from the monitors and written as soon as they are
+generated, so the memory used by an export does not depend on the length
+of the simulation. This module does not depend on Qt.
+"""
+import heapq
+import itertools
+import json
+import os.path
+import re
+
+from simso.core import JobEvent, ProcEvent
+
+# Identifiers of the "processes" of the trace-event format.
+PROCESSORS_PID = 0
+TASKS_PID = 1
+
+# Units of time allowed by the VCD format, in femtoseconds.
+VCD_TIMESCALES = [(10 ** (3 * k + e), "%d %s" % (10 ** e, unit))
+                  for k, unit in enumerate(("fs", "ps", "ns", "us", "ms", "s"))
+                  for e in range(3)]
+
+
+def _us(date, cycles_per_ms):
+    """Convert a date in cycles to microseconds."""
+    return date * 1000.0 / cycles_per_ms
+
+
+def processor_events(processor, end_date, cycles_per_ms):
+    """
+    Generate the trace events of a processor: a complete event for each
+    job execution and each overhead, with the date of the next event of
+    the monitor as end date.
+    """
+    current = None
+    for date, evt in processor.monitor:
+        if current is not None and date > current[0]:
+            yield dict(current[1], ts=_us(current[0], cycles_per_ms),
+                       dur=_us(date - current[0], cycles_per_ms))
+        if evt.event == ProcEvent.RUN:
+            current = (date, {"name": evt.args.name, "cat": "run",
+                              "args": {"task": evt.args.task.name}})
+        elif evt.event == ProcEvent.OVERHEAD:
+            current = (date, {"name": str(evt.args), "cat": "overhead"})
+        else:
+            current = None
+    if current is not None and end_date > current[0]:
+        yield dict(current[1], ts=_us(current[0], cycles_per_ms),
+                   dur=_us(end_date - current[0], cycles_per_ms))
+
+
+def task_events(task, end_date, cycles_per_ms):
+    """
+    Generate the trace events of a task: a complete event for each
+    execution segment of its jobs and instant events for the activations,
+    the deadline misses and the aborts. The jobs that are not finished at
+    end_date miss their deadline if it is before end_date.
+    """
+    running = {}
+    # Jobs activated and not finished yet, in activation order.
+    active = {}
+    for date, evt in task.monitor:
+        job = evt.job
+        if evt.event == JobEvent.ACTIVATE:
+            active[job] = None
+            yield {"name": "Activation " + job.name, "cat": "activation",
+                   "ph": "i", "s": "t", "ts": _us(date, cycles_per_ms)}
+            continue
+
+        start = running.pop(job, None)
+        if start is not None and date > start[0]:
+            yield {"name": job.name, "cat": "execution", "ph": "X",
+                   "ts": _us(start[0], cycles_per_ms),
+                   "dur": _us(date - start[0], cycles_per_ms),
+                   "args": {"cpu": start[1]}}
+
+        if evt.event == JobEvent.EXECUTE:
+            running[job] = (date, evt.cpu.name if evt.cpu else None)
+        elif evt.event == JobEvent.ABORTED:
+            active.pop(job, None)
+            yield {"name": "Abort " + job.name, "cat": "abort", "ph": "i",
+                   "s": "t", "ts": _us(date, cycles_per_ms)}
+        elif evt.event == JobEvent.TERMINATED:
+            active.pop(job, None)
+            if date > job.absolute_deadline * cycles_per_ms:
+                yield {"name": "Deadline miss " + job.name,
+                       "cat": "deadline miss", "ph": "i", "s": "t",
+                       "ts": job.absolute_deadline * 1000.0}
+
+    for job, (start, cpu) in running.items():
+        if end_date > start:
+            yield {"name": job.name, "cat": "execution", "ph": "X",
+                   "ts": _us(start, cycles_per_ms),
+                   "dur": _us(end_date - start, cycles_per_ms),
+                   "args": {"cpu": cpu}}
+
+    for job in active:
+        if end_date > job.absolute_deadline * cycles_per_ms:
+            yield {"name": "Deadline miss " + job.name,
+                   "cat": "deadline miss", "ph": "i", "s": "t",
+                   "ts": job.absolute_deadline * 1000.0}
+
+
+def trace_events(sim):
+    """
+    Generate the events of the simulation sim in the trace-event format
+    (Chrome tracing, Perfetto). The processors and the tasks are the
+    threads of two processes.
+    """
+    end_date = sim.now()
+    cycles_per_ms = float(sim.cycles_per_ms)
+
+    for pid, name in ((PROCESSORS_PID, "Processors"), (TASKS_PID, "Tasks")):
+        yield {"name": "process_name", "ph": "M", "pid": pid,
+               "args": {"name": name}}
+
+    for pid, items, events in (
+            (PROCESSORS_PID, sim.processors, processor_events),
+            (TASKS_PID, sim.task_list, task_events)):
+        for k, item in enumerate(items):
+            tid = item.identifier
+            yield {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                   "args": {"name": item.name}}
+            yield {"name": "thread_sort_index", "ph": "M", "pid": pid,
+                   "tid": tid, "args": {"sort_index": k}}
+            for event in events(item, end_date, cycles_per_ms):
+                event.setdefault("ph", "X")
+                event["pid"] = pid
+                event["tid"] = tid
+                yield event
+
+
+def write_trace_events(sim, out):
+    """Write the trace events of the simulation sim as JSON to out."""
+    out.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+    separator = ''
+    for event in trace_events(sim):
+        out.write(separator)
+        out.write(json.dumps(event, separators=(',', ':')))
+        separator = ',\n'
+    out.write('\n]}\n')
+
+
+def export_trace_events(sim, filename):
+    with open(filename, 'w') as out:
+        write_trace_events(sim, out)
+
+
+def vcd_timescale(cycles_per_ms):
+    """
+    Return the largest timescale of the VCD format that divides the
+    duration of a cycle, and the number of time units per cycle.
+    """
+    cycle = 10 ** 12 / float(cycles_per_ms)
+    for duration, timescale in reversed(VCD_TIMESCALES):
+        if cycle >= duration and (cycle / duration).is_integer():
+            return timescale, int(cycle // duration)
+    # The cycles are rounded to the femtosecond.
+    return VCD_TIMESCALES[0][1], cycle
+
+
+def vcd_identifier(k):
+    """Short identifier of the k-th variable, made of printable chars."""
+    identifier = ""
+    while True:
+        identifier += chr(33 + k % 94)
+        k //= 94
+        if not k:
+            return identifier
+
+
+def vcd_name(name):
+    return re.sub(r'\W', '_', name)
+
+
+def processor_changes(processor, running, overhead):
+    """
+    Generate the (date, variable, value) of the variables of a processor:
+    running is the identifier of the task it runs (None, written as z, when
+    it does not run a job) and overhead is 1 during the overheads.
+    """
+    for date, evt in processor.monitor:
+        if evt.event == ProcEvent.RUN:
+            yield date, running, evt.args.task.identifier
+        else:
+            yield date, running, None
+        yield date, overhead, int(evt.event == ProcEvent.OVERHEAD)
+
+
+def task_changes(task, state):
+    """
+    Generate the (date, variable, value) of the state of a task: the kind
+    of the last JobEvent of its jobs.
+    """
+    for date, evt in task.monitor:
+        yield date, state, evt.event
+
+
+def write_vcd(sim, out):
+    """
+    Write the simulation sim as a Value Change Dump to out. The changes of
+    all the monitors are merged by date as they are read, and only the last
+    value of each variable at a date is written, if it changed.
+    """
+    timescale, scale = vcd_timescale(sim.cycles_per_ms)
+    width = max([t.identifier for t in sim.task_list] + [1]).bit_length()
+
+    out.write("$version SimSo $end\n")
+    out.write("$timescale %s $end\n" % timescale)
+    variables = []
+    scalars = set()
+    # Variables of the processors, which are z when no job runs.
+    idle = set()
+    changes = []
+
+    out.write("$scope module processors $end\n")
+    for processor in sim.processors:
+        running = vcd_identifier(len(variables))
+        overhead = vcd_identifier(len(variables) + 1)
+        name = vcd_name(processor.name)
+        out.write("$var wire %d %s %s $end\n" % (width, running, name))
+        out.write("$var wire 1 %s %s_overhead $end\n" % (overhead, name))
+        variables += [running, overhead]
+        scalars.add(overhead)
+        idle.add(running)
+        changes.append(processor_changes(processor, running, overhead))
+    out.write("$upscope $end\n")
+
+    out.write("$scope module tasks $end\n")
+    for task in sim.task_list:
+        state = vcd_identifier(len(variables))
+        out.write("$var wire 3 %s %s $end\n" % (state, vcd_name(task.name)))
+        variables.append(state)
+        changes.append(task_changes(task, state))
+    out.write("$upscope $end\n")
+    out.write("$enddefinitions $end\n")
+
+    def change(variable, value):
+        if variable in scalars:
+            return "%d%s\n" % (value, variable)
+        if value is None:
+            return "bz %s\n" % variable
+        return "b%s %s\n" % (bin(value)[2:], variable)
+
+    out.write("$dumpvars\n")
+    values = dict((variable, None if variable in idle else 0)
+                  for variable in variables)
+    for variable in variables:
+        out.write(change(variable, values[variable]))
+    out.write("$end\n")
+
+    time = 0
+    for date, group in itertools.groupby(
+            heapq.merge(*changes, key=lambda change: change[0]),
+            key=lambda change: change[0]):
+        # Last value of each variable at date.
+        last = dict((variable, value) for _, variable, value in group)
+        lines = [change(variable, value) for variable, value in last.items()
+                 if values[variable] != value]
+        values.update(last)
+        if lines:
+            time = round(date * scale)
+            out.write("#%d\n" % time)
+            out.writelines(lines)
+    if round(sim.now() * scale) > time:
+        out.write("#%d\n" % round(sim.now() * scale))
+
+
+def export_vcd(sim, filename):
+    with open(filename, 'w') as out:
+        write_vcd(sim, out)
+
+
+def export_trace(sim, filename):
+    """
+    Export the trace of the simulation sim in the format given by the
+    extension of filename.
+    """
+    exporters = {".json": export_trace_events, ".vcd": export_vcd}
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in exporters:
+        raise ValueError("Unknown trace format: %s" % extension)
+    exporters[extension](sim, filename)
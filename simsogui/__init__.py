@@ -12,13 +12,18 @@ def run_gui():
     from simsogui.SimulatorWindow import SimulatorWindow
 
     parser = optparse.OptionParser()
-    parser.add_option('-t', '--text', help='run script instead of a GUI',
+    parser.add_option('-t', '--text', help='run script instead of a GUI '
+                      '(deprecated, use simso-batch)',
                       action='store', dest='script')
     (opts, args) = parser.parse_args()
 
     if opts.script:
-        import imp
-        script = imp.load_source("", opts.script)
+        import importlib.util
+        print("simso -t is deprecated, use simso-batch to run simulations "
+              "without a GUI.", file=sys.stderr)
+        spec = importlib.util.spec_from_file_location("script", opts.script)
+        script = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(script)
         script.main(args)
     else:
         app = QApplication(args)